@@ -1,6 +1,6 @@
 """
 All modules should use the CONFIG configuration instance to access
-global settings.
+global settings, unless given their own Config (see config.py).
 """
 from config import Config
 
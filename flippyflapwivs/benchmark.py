@@ -0,0 +1,215 @@
+"""
+benchmark.py
+Author: Adam Beagle
+
+PURPOSE:
+  Repeatable benchmarks of the simulation and rendering hot paths, run
+  under SDL's dummy video and audio drivers so no display is needed.
+
+  Measured for each resolution, FPS limit and render mode:
+    game_update      - Headless GameData update frames/sec
+    level.update     - ui Level update per frame
+    spawn_column     - Level._spawn_column per call, timed over SPAWNS
+                       calls after the run (columns spawn too rarely in
+                       it for a stable mean)
+    uim.update       - UIManager.update per frame
+    collision        - Per-pixel player vs level sprite collision per frame
+    uim.draw         - UIManager.draw (incl. display update) per frame
+
+  Since CONFIG can only be set once per process, each case runs in a
+  child process. Results are written as JSON so runs can be compared.
+
+USAGE:
+  python benchmark.py [--out PATH] [--frames N]
+  Run with -h for all options.
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+import json
+from os import environ, path
+import platform
+import subprocess
+import sys
+from time import perf_counter
+
+# Must be set before pygame is imported
+environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+# Add root directory to sys.path if package not installed
+try:
+    from flippyflapwivs import CONFIG
+except ImportError:
+    sys.path.append(
+        path.abspath(path.join(path.dirname(__file__), path.pardir))
+    )
+    from flippyflapwivs import CONFIG
+
+from game import GameData, GameState
+from profiler import FrameTimer
+from ui import UIManager
+import headless
+
+RESOLUTIONS = ((800, 600), (1920, 1080), (3840, 2160))
+FPS_LIMITS = (60, 120)
+MODES = ('sprites', 'dirty', 'ring')
+SPAWNS = 1000
+
+def main():
+    args = parse_args()
+
+    if args.case is not None:
+        w, h, fps = (int(v) for v in args.case[:3])
+        print(json.dumps(run_case((w, h), fps, args.case[3], args.frames)))
+        return
+
+    results = []
+    for resolution in RESOLUTIONS:
+        for fps in FPS_LIMITS:
+            for mode in MODES:
+                print('{}x{} {}fps {}...'.format(resolution[0],
+                    resolution[1], fps, mode), file=sys.stderr
+                )
+                out = subprocess.check_output([
+                    sys.executable, path.abspath(__file__),
+                    '--frames', str(args.frames),
+                    '--case', str(resolution[0]), str(resolution[1]),
+                    str(fps), mode,
+                ])
+                # Results are the last line, in case anything else printed
+                results.append(json.loads(out.decode().splitlines()[-1]))
+
+    with open(args.out, 'w') as f:
+        json.dump({
+            'meta' : {
+                'time' : datetime.now().isoformat(),
+                'python' : platform.python_version(),
+                'pygame' : pygame.version.ver,
+                'platform' : platform.platform(),
+                'frames' : args.frames,
+            },
+            'results' : results,
+        }, f, indent=2)
+
+    print('Wrote', args.out, file=sys.stderr)
+
+def run_case(resolution, fps, mode, frames):
+    """
+    Benchmark one resolution/FPS limit/render mode for frames frames.
+    Must run in a fresh process. Return dict of results, times in ms.
+    """
+    CONFIG.DIRTY_RECTS = mode == 'dirty'
+    CONFIG.FPS_LIMIT = fps
+    CONFIG.FULLSCREEN = False
+    CONFIG.INTERPOLATE = False
+    CONFIG.MUTE = True
+    CONFIG.PRECISE_COLLISION = False
+    CONFIG.RING_LEVEL = mode == 'ring'
+    CONFIG.SCREEN_SIZE = resolution
+    CONFIG.TICK_RATE = fps
+    CONFIG.lock()
+
+    gdt = 60 / fps
+    inputs = headless.AutopilotInput()
+
+    # Simulation alone
+    stats = headless.run(GameState(), GameData(0, seed=0), inputs, frames,
+        gdt
+    )
+
+    # Simulation with ui
+    pygame.display.init()
+    gs = GameState()
+    gd = GameData(0, seed=0)
+    uim = UIManager(gd.n_columns, gdt*gd.scroll_speed, gd.gap_values)
+    timer = FrameTimer(window=frames)
+
+    # uim calls the bound methods in its handler table, not attributes of
+    # level, so the timed update replaces level.update there
+    level_update = uim.level.update
+    def timed_level_update(*args):
+        with timer.phase('level.update'):
+            level_update(*args)
+    uim._updates = tuple(
+        tuple(timed_level_update if update == level_update else update
+            for update in updates
+        ) for updates in uim._updates
+    )
+
+    # One untimed frame before the first flap, as in the game, in which
+    # the first column spawns at the right edge. Flapping at once would
+    # scroll it past the spawn point unseen.
+    gs.transition_state()
+    gd.update(gs, gdt)
+    uim.update(gs, gd, 1)
+    gd.postupdate(gs, gdt)
+
+    for frame in range(frames):
+        gs.transition_state()
+        if (inputs.flap(frame, gd) and
+            gs.state in (gs.WAIT_FIRST_FLAP, gs.DEFAULT)
+        ):
+            gs.state = gs.FLAP
+
+        gd.update(gs, gdt)
+        with timer.phase('uim.update'):
+            uim.update(gs, gd, 1)
+        gd.postupdate(gs, gdt)
+
+        if uim.level.sprites:
+            with timer.phase('collision'):
+                pygame.sprite.spritecollide(uim.player, uim.level.sprites,
+                    collided=pygame.sprite.collide_mask, dokill=False
+                )
+
+        with timer.phase('uim.draw'):
+            uim.draw()
+
+        timer.end_frame()
+
+    spawn_mean = None
+    if hasattr(uim.level, '_spawn_column'):
+        level = uim.level
+        gaps = gd.gap_values
+        start = perf_counter()
+        for i in range(SPAWNS):
+            level._spawn_column(i % len(level.columns), gaps[i % len(gaps)])
+        spawn_mean = 1000*(perf_counter() - start) / SPAWNS
+
+    pygame.quit()
+
+    summary = timer.summary()
+    summary.pop('frame')
+    return {
+        'resolution' : list(resolution),
+        'fps_limit' : fps,
+        'mode' : mode,
+        'game_update_fps' : stats['fps'],
+        'spawn_column' : {
+            'count' : SPAWNS if spawn_mean is not None else 0,
+            'mean' : spawn_mean,
+        },
+        'phases' : summary,
+    }
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Benchmark FlippyFlap Wivs simulation and rendering.'
+    )
+    parser.add_argument('--out', default='bench_results.json',
+        metavar='PATH', help='Results file (default bench_results.json)'
+    )
+    parser.add_argument('--frames', type=int, default=2000, metavar='int',
+        help='Frames per case (default 2000)'
+    )
+    parser.add_argument('--case', nargs=4, metavar=('W', 'H', 'FPS', 'MODE'),
+        help='Run a single case and print its results (used internally)'
+    )
+    return parser.parse_args()
+
+###############################################################################
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,13 @@ PURPOSE:
   an initial set (from e.g. command line options) and provides a lock()
   method to prevent further changes.
 
-Yes, there are global state problems here, it would take no real effort
-to get around the _locked attribute, and if some module imported Config rather
-than the global constant, depending on when it was imported, _locked could have
-multiple reported states within the program. I don't claim this to be a great
-design pattern, just minimal protection on a silly one-man project.
+  The global CONFIG is the default of the whole ui, but each instance holds
+  and locks its own options, so a session (e.g. one of many FlapEnvs in a
+  process) may instead pass its own Config to UIManager.
+
+It would take no real effort to get around the _locked attribute; I don't
+claim this to be a great design pattern, just minimal protection on a silly
+one-man project.
 """
 class ConfigLockError(Exception):
     pass
@@ -21,28 +23,72 @@ class Config:
     Configuration wrapper.
 
     ATTRIBUTES:
+      DIRTY_RECTS (read-only once locked)
       FPS_LIMIT (read-only once locked)
       FULLSCREEN (read-only once locked)
+      INTERPOLATE (read-only once locked)
       MUTE (r/w)
+      PRECISE_COLLISION (read-only once locked)
+      RENDER_SIZE (read-only once locked) - Size everything is laid out and
+        drawn at. Defaults to SCREEN_SIZE; if different, frames are drawn
+        offscreen and scaled to the screen.
+      RING_LEVEL (read-only once locked)
+      SCALE_MODE (read-only once locked) - 'integer' or 'smooth' scaling of
+        RENDER_SIZE frames to the screen
       SCREEN_SIZE (read-only once locked)
+      TICK_RATE (read-only once locked)
 
     METHODS:
       lock
+      locked (property)
 
     USAGE:
       It is expected that a global instance of CONFIG be created at some early
       point by main or the top-level __init__, and that lock() is called
       once the config options are instantiated.
+
+      Other instances may be created with options as keyword arguments:
+        config = Config(SCREEN_SIZE=(320, 240), MUTE=True)
+        config.lock()
     """
     MUTE = None
+    _dirty_rects = None
     _fps_limit = None
     _fullscreen = None
+    _interpolate = None
+    _precise_collision = None
+    _render_size = None
+    _ring_level = None
+    _scale_mode = None
     _screenres = None
+    _tick_rate = None
     _locked = False
 
-    @classmethod
-    def lock(cls):
-        cls._locked = True
+    def __init__(self, **options):
+        for name, val in options.items():
+            if not name.isupper() or not hasattr(type(self), name):
+                raise AttributeError('Unknown config option ' + name)
+            setattr(self, name, val)
+
+    def lock(self):
+        self._locked = True
+
+    @property
+    def locked(self):
+        return self._locked
+
+    @property
+    def DIRTY_RECTS(self):
+        return self._dirty_rects
+
+    @DIRTY_RECTS.setter
+    def DIRTY_RECTS(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set DIRTY_RECTS once Config is locked."
+            )
+
+        self._dirty_rects = val
 
     @property
     def FPS_LIMIT(self):
@@ -70,6 +116,71 @@ class Config:
 
         self._fullscreen = val
 
+    @property
+    def INTERPOLATE(self):
+        return self._interpolate
+
+    @INTERPOLATE.setter
+    def INTERPOLATE(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set INTERPOLATE once Config is locked."
+            )
+
+        self._interpolate = val
+
+    @property
+    def PRECISE_COLLISION(self):
+        return self._precise_collision
+
+    @PRECISE_COLLISION.setter
+    def PRECISE_COLLISION(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set PRECISE_COLLISION once Config is locked."
+            )
+
+        self._precise_collision = val
+
+    @property
+    def RENDER_SIZE(self):
+        return self._render_size or self._screenres
+
+    @RENDER_SIZE.setter
+    def RENDER_SIZE(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set RENDER_SIZE once Config is locked."
+            )
+
+        self._render_size = val
+
+    @property
+    def RING_LEVEL(self):
+        return self._ring_level
+
+    @RING_LEVEL.setter
+    def RING_LEVEL(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set RING_LEVEL once Config is locked."
+            )
+
+        self._ring_level = val
+
+    @property
+    def SCALE_MODE(self):
+        return self._scale_mode
+
+    @SCALE_MODE.setter
+    def SCALE_MODE(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set SCALE_MODE once Config is locked."
+            )
+
+        self._scale_mode = val
+
     @property
     def SCREEN_SIZE(self):
         return self._screenres
@@ -82,3 +193,16 @@ class Config:
             )
 
         self._screenres = val
+
+    @property
+    def TICK_RATE(self):
+        return self._tick_rate
+
+    @TICK_RATE.setter
+    def TICK_RATE(self, val):
+        if self._locked:
+            raise ConfigLockError(
+                "Cannot set TICK_RATE once Config is locked."
+            )
+
+        self._tick_rate = val
@@ -0,0 +1,232 @@
+"""
+env.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains FlapEnv, a Gym-style environment wrapping the game for bots:
+  reset() starts an episode and step(action) advances it.
+
+  Observations are either the state vector of GameData.observe() or pixel
+  frames drawn by the ui. Pixel frames are views (pygame.surfarray.pixels3d)
+  of the surface the frame was drawn to, not copies. Frames are drawn to
+  two surfaces in turn, so a frame stays valid through the next step() or
+  reset() and is overwritten by the one after: copy one to keep it longer.
+  While a view exists its surface is locked, so drawing the frame after
+  next fails if a view of this frame is still referenced. Grayscale frames,
+  optionally downsampled, and state vectors are likewise written to two
+  reused buffers.
+
+  NumPy is required. For pixel observations, pygame's display is
+  initialized with SDL's dummy video driver unless SDL_VIDEODRIVER is set.
+  Frames are drawn offscreen with the env's own Config: the one passed in,
+  else the global CONFIG if it is locked, else defaults suited to bots. So
+  pixel envs of different sizes can run side by side in one process.
+
+USAGE:
+    env = FlapEnv(obs_type='pixels', grayscale=True, downsample=4)
+    obs = env.reset()
+    while True:
+        obs, reward, done, info = env.step(policy(obs))
+        if done:
+            obs = env.reset()
+"""
+from os import environ, path
+import sys
+
+import numpy as np
+import pygame
+
+# Add root directory to sys.path if package not installed
+try:
+    from flippyflapwivs import CONFIG, Config
+except ImportError:
+    sys.path.append(
+        path.abspath(path.join(path.dirname(__file__), path.pardir))
+    )
+    from flippyflapwivs import CONFIG, Config
+
+from game import GameData, GameState
+from ui import UIManager, game_tile_size
+
+class FlapEnv:
+    """
+    A game for one bot. Each episode is one game, started by a flap on its
+    first frame; it is done when the player collides, or after max_frames
+    frames if given. Reward is the number of points scored by the step.
+
+    Each step() repeats for frame_skip frames, flapping only on the first
+    if the action is truthy; a pixel frame is only drawn after the last.
+
+    ATTRIBUTES:
+      GRAY_WEIGHTS - Integer RGB weights of grayscale, summing to 256
+      config       - Config of pixel frames, or None
+      frame_skip
+      obs_type     - 'state' or 'pixels'
+      uimanager    - ui.UIManager drawing pixel frames, or None
+
+    METHODS:
+      close
+      reset
+      step
+    """
+    GRAY_WEIGHTS = np.array((77, 150, 29), dtype=np.uint16)
+
+    def __init__(self, obs_type='state', frame_skip=1, grayscale=False,
+        downsample=1, seed=None, max_frames=None, size=(800, 600),
+        config=None
+    ):
+        """
+        grayscale, downsample (an integer stride) and config apply to pixel
+        observations only. size is the screen size of the default config.
+        """
+        if obs_type not in ('state', 'pixels'):
+            raise ValueError('obs_type must be state or pixels')
+
+        self.obs_type = obs_type
+        self.frame_skip = frame_skip
+        self.max_frames = max_frames
+        self._grayscale = grayscale
+        self._downsample = downsample
+        self._states = [np.zeros(4) for i in range(2)]
+        self._frames = 0
+        self._buffer = 0 # Index of the next buffer to observe into
+
+        if obs_type == 'pixels':
+            if config is None:
+                config = CONFIG if CONFIG.locked else _config(size)
+            self.config = config
+            environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            pygame.display.init()
+
+            self._gs = GameState()
+            self._gd = GameData(0, seed,
+                collision=not config.PRECISE_COLLISION,
+                tile=game_tile_size(config)
+            )
+            self.uimanager = UIManager(self._gd.n_columns,
+                self._gd.scroll_speed, self._gd.gap_values, config=config,
+                offscreen=True
+            )
+
+            screen = self.uimanager.screen
+            self._surfaces = [screen.copy() for i in range(2)]
+            self._views = [None, None]
+
+            w, h = screen.get_size()
+            shape = (len(range(0, h, downsample)),
+                len(range(0, w, downsample))
+            )
+            self._gray16 = np.empty(shape, dtype=np.uint16)
+            self._grays = [np.empty(shape, dtype=np.uint8) for i in range(2)]
+        else:
+            self._gs = GameState()
+            self._gd = GameData(0, seed)
+            self.config = None
+            self.uimanager = None
+
+    def close(self):
+        if self.uimanager is not None:
+            self._views = [None, None]
+            pygame.quit()
+
+    def reset(self):
+        """Start a new episode. Return its first observation."""
+        gs = self._gs
+        if gs.state != gs.WAIT_FIRST_FLAP:
+            # A RESET frame resets game and ui; it transitions to
+            # WAIT_FIRST_FLAP at the start of the next frame
+            gs.state = gs.RESET
+            self._update()
+        else:
+            # A new game. Like the RESET frame, one frame is run before the
+            # first flap, in which the ui spawns the first column at the
+            # right edge; flapping at once would scroll it past unseen.
+            self._update()
+
+        self._frames = 0
+        self._advance(True)
+        return self._observe()
+
+    def step(self, action):
+        """
+        Advance frame_skip frames, flapping first if action is truthy.
+        Return (observation, reward, done, info); info has the 'score' and
+        'frames' of the episode so far.
+        """
+        gd = self._gd
+        score = gd.score
+        done = self._advance(action)
+
+        return self._observe(), gd.score - score, done, {
+            'score' : gd.score,
+            'frames' : self._frames,
+        }
+
+    def _advance(self, flap):
+        """
+        Run frame_skip frames, flapping on the first if flap. Return True
+        once the episode is done.
+        """
+        gs = self._gs
+        for i in range(self.frame_skip):
+            gs.transition_state()
+            if flap and i == 0 and gs.in_group(gs.FLAPPABLE):
+                gs.state = gs.FLAP
+
+            self._update()
+            self._frames += 1
+
+            if gs.in_group(gs.NOMOVE):
+                return True
+            if self.max_frames is not None and self._frames >= self.max_frames:
+                return True
+
+        return False
+
+    def _observe(self):
+        i = self._buffer
+        self._buffer = 1 - i
+        if self.uimanager is None:
+            return self._gd.observe(self._states[i])
+
+        self._views[i] = None # Releases env's lock on the surface
+
+        self.uimanager.draw(surface=self._surfaces[i])
+
+        # Transposed view, so (row, column, channel) like most image APIs
+        step = self._downsample
+        pixels = pygame.surfarray.pixels3d(
+            self._surfaces[i]
+        ).transpose(1, 0, 2)[::step, ::step]
+        if not self._grayscale:
+            self._views[i] = pixels
+            return pixels
+
+        gray = self._grays[i]
+        np.matmul(pixels, self.GRAY_WEIGHTS, out=self._gray16)
+        np.right_shift(self._gray16, 8, out=self._gray16)
+        np.copyto(gray, self._gray16, casting='unsafe')
+        return gray
+
+    def _update(self):
+        gs = self._gs
+        self._gd.update(gs, 1)
+        if self.uimanager is not None:
+            self.uimanager.update(gs, self._gd, 1)
+        self._gd.postupdate(gs, 1)
+
+def _config(size):
+    """Return a locked Config for offscreen rendering at size."""
+    config = Config(
+        DIRTY_RECTS=False,
+        FPS_LIMIT=60,
+        FULLSCREEN=False,
+        INTERPOLATE=False,
+        MUTE=True,
+        PRECISE_COLLISION=False,
+        RING_LEVEL=False,
+        SCREEN_SIZE=size,
+        TICK_RATE=60,
+    )
+    config.lock()
+    return config
@@ -0,0 +1,209 @@
+"""
+evaluate.py
+Author: Adam Beagle
+
+PURPOSE:
+  Evaluates a policy over many headless episodes in parallel across a
+  process pool, and aggregates the scores.
+
+  A policy is a picklable callable taking a GameData.observation and
+  returning True to flap, e.g. a module-level function or an instance of a
+  module-level class such as headless.AutopilotInput. An episode is one
+  game, started by a flap on its first frame (so a policy need not know
+  how to start a game), until the player dies or max_frames is reached.
+
+  Each episode has its own game seed and policy seed, drawn in order from
+  a single seed, so results are reproducible regardless of the number of
+  workers. Before each episode the worker seeds the random module with the
+  episode's policy seed, for policies that use it.
+
+  Episodes may be event-driven (see headless.run()) if the policy has a
+  next_flap() method, like headless.AutopilotInput.
+
+USAGE:
+  python evaluate.py [POLICY] [--episodes M] [--workers N] [--seed S]
+  POLICY is module:name of a policy, or of a class whose instances are
+  policies (default headless:AutopilotInput). Run with -h for all options.
+
+    from evaluate import evaluate
+    results = evaluate(my_policy, 1000)
+    print(results['summary'])
+"""
+from argparse import ArgumentParser
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+import json
+import os
+import random
+import statistics
+from time import perf_counter
+
+from game import GameData, GameState
+import headless
+
+def evaluate(policy, episodes, workers=None, seed=0, max_frames=100000,
+        dt=1, event_driven=False
+    ):
+    """
+    Run episodes episodes of policy across workers processes (default is
+    the number of CPUs), event-driven if event_driven. Return dict of:
+      scores  - Score of each episode, in episode order
+      frames  - Frames run by each episode, in episode order
+      seconds - Wall time
+      summary - See summarize()
+    """
+    if episodes < 1:
+        raise ValueError('episodes must be at least 1')
+
+    rng = random.Random(seed)
+    seeds = [(rng.getrandbits(64), rng.getrandbits(64))
+        for i in range(episodes)
+    ]
+    workers = workers or os.cpu_count() or 1
+
+    # Several chunks per worker keeps workers busy when episode lengths vary
+    size = max(1, episodes // (4*workers))
+    chunks = [seeds[i:i + size] for i in range(0, episodes, size)]
+
+    start = perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        results = [r for chunk_results in executor.map(_run_episodes,
+            [(policy, chunk, max_frames, dt, event_driven)
+                for chunk in chunks
+            ]
+        ) for r in chunk_results]
+    elapsed = perf_counter() - start
+
+    scores = [score for score, frames in results]
+    return {
+        'scores' : scores,
+        'frames' : [frames for score, frames in results],
+        'seconds' : elapsed,
+        'summary' : summarize(scores),
+    }
+
+def run_episode(policy, game_seed, policy_seed, max_frames=100000, dt=1,
+        event_driven=False
+    ):
+    """Run one episode. Return (score, frames run)."""
+    random.seed(policy_seed)
+    gs = GameState()
+    gd = GameData(0, game_seed)
+    score = 0
+    frame = 0
+
+    while frame < max_frames:
+        n = 0
+        if event_driven:
+            n = min(headless.idle_frames(gs, gd, policy, frame, dt),
+                max_frames - frame
+            )
+
+        if n > 0:
+            frame += gd.advance(gs, n, dt)
+        else:
+            headless.step(gs, gd, frame == 0 or policy(gd.observation), dt)
+            frame += 1
+
+        if gs.state == gs.RESET:
+            return score, frame
+        score = gd.score
+
+    return score, max_frames
+
+def summarize(scores):
+    """
+    Return OrderedDict of count, mean, stdev, min, p10/p50/p90, max and
+    histogram (score to count, ascending) of scores, which must not be
+    empty.
+    """
+    ordered = sorted(scores)
+    n = len(ordered)
+    summary = OrderedDict(
+        count=n,
+        mean=statistics.mean(ordered),
+        stdev=statistics.pstdev(ordered),
+        min=ordered[0],
+    )
+    for p in (10, 50, 90):
+        summary['p{}'.format(p)] = ordered[min(n - 1, int(p*n / 100))]
+    summary['max'] = ordered[-1]
+    summary['histogram'] = OrderedDict(sorted(Counter(ordered).items()))
+
+    return summary
+
+def load_policy(spec):
+    """
+    Return the policy named by spec, 'module:name'. If name is a class, an
+    instance created with no arguments is returned.
+    """
+    module, name = spec.split(':')
+    policy = getattr(import_module(module), name)
+    return policy() if isinstance(policy, type) else policy
+
+def main():
+    args = parse_args()
+    results = evaluate(load_policy(args.policy), args.episodes, args.workers,
+        args.seed, args.max_frames, event_driven=args.event_driven
+    )
+
+    summary = results['summary']
+    print(
+        '{} episodes in {:.3f}s: mean {mean:.2f} (sd {stdev:.2f}), '
+        'min {min}, p10 {p10}, p50 {p50}, p90 {p90}, max {max}'.format(
+            args.episodes, results['seconds'], **summary
+        )
+    )
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(dict(results, policy=args.policy, seed=args.seed), f,
+                indent=2
+            )
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Evaluate a FlippyFlap Wivs policy in parallel.'
+    )
+    parser.add_argument('policy', nargs='?',
+        default='headless:AutopilotInput',
+        help='module:name of the policy (default headless:AutopilotInput)'
+    )
+    parser.add_argument('--episodes', type=int, default=1000, metavar='int',
+        help='Number of episodes (default 1000)'
+    )
+    parser.add_argument('--workers', type=int, metavar='int',
+        help='Number of worker processes (default is the number of CPUs)'
+    )
+    parser.add_argument('--seed', type=int, default=0, metavar='int',
+        help='Seed of all episodes (default 0)'
+    )
+    parser.add_argument('--max-frames', type=int, default=100000,
+        metavar='int', help='Frame limit of each episode (default 100000)'
+    )
+    parser.add_argument('--event-driven', action='store_true',
+        help='Skip frames between flaps and game events in closed form; the '
+             'policy must have a next_flap() method'
+    )
+    parser.add_argument('--out', metavar='PATH',
+        help='Write scores and summary to PATH as JSON'
+    )
+
+    args = parser.parse_args()
+    if args.episodes < 1:
+        parser.error('--episodes must be at least 1')
+
+    return args
+
+def _run_episodes(args):
+    """Worker: run_episode() for each (game, policy) seed pair."""
+    policy, seeds, max_frames, dt, event_driven = args
+    return [run_episode(policy, game_seed, policy_seed, max_frames, dt,
+            event_driven
+        ) for game_seed, policy_seed in seeds
+    ]
+
+###############################################################################
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+batch.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains BatchGame, a NumPy-backed engine which holds N independent games
+  as arrays and advances all of them with a single step() call. Intended for
+  headless training and evaluation, where stepping one Game per bot in pure
+  Python is the bottleneck.
+
+  Physics are those of gamedata.Player, gamedata.Column and gamedata.Game
+  (gravity, flap, scroll, column wraparound, scoring and collision),
+  applied with the same ordering so that a BatchGame of size 1 tracks a
+  Game frame for frame given the same column openings. Openings are drawn
+  from a NumPy generator rather than Game.rng.
+
+  Geometry is that of a Game with the reference tile size, Game.TILE.
+  GameState.reset_delay is not modelled: a game resets as soon as its
+  player reaches the ground after a collision, as with a delay of 0.
+
+USAGE:
+  NumPy is required by this module only, so it is not imported by the
+  package's __init__.py:
+
+    from game.batch import BatchGame
+
+    bg = BatchGame(1000)
+    while True:
+        bg.step(policy(bg.player_y, bg.player_dy, bg.column_x))
+"""
+import numpy as np
+
+from .gamedata import Column, Game, Player
+from .states import (COLLISION, FLAP, FLAPPABLE, MAINGAME, MOVING, RESET,
+    SCORE, TRANSITIONS, WAIT_FIRST_FLAP, WAIT_RESET, in_group
+)
+
+_TRANSITIONS = np.array(TRANSITIONS, dtype=np.int8)
+
+class BatchGame:
+    """
+    N games advanced in lockstep. All attributes are arrays with a leading
+    axis of length n, and may be read (but should not be resized) by users.
+
+    ATTRIBUTES:
+      n          - Number of games
+      state      - State code of each game (see states module)
+      player_y
+      player_dy
+      score
+      high_score
+      column_x   - Shape (n, Game.N_COLUMNS)
+      column_gap - Shape (n, Game.N_COLUMNS), see gamedata.Column.gap
+      rng        - numpy.random.Generator used to pick column openings
+      time       - Simulated seconds elapsed in each game
+
+    METHODS:
+      reset
+      step
+    """
+    def __init__(self, n, high_score=0, seed=None):
+        self.n = n
+        self.state = np.full(n, WAIT_FIRST_FLAP, dtype=np.int8)
+        self.player_y = np.empty(n)
+        self.player_dy = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.high_score = np.full(n, high_score, dtype=np.int64)
+        self.column_x = np.empty((n, Game.N_COLUMNS))
+        self.column_gap = np.empty((n, Game.N_COLUMNS))
+        self.time = np.zeros(n)
+        self.rng = np.random.default_rng(seed)
+
+        self._column_start = 1 + np.arange(Game.N_COLUMNS)*(
+            Column.W + Game.COLUMN_DIST
+        )
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        Reset the games selected by boolean array mask (all games if None),
+        as Game.reset() does.
+        """
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+
+        self.column_x[mask] = self._column_start
+        self.column_gap[mask] = self._random_gaps(
+            (np.count_nonzero(mask), Game.N_COLUMNS)
+        )
+        self.player_y[mask] = Player.STARTY
+
+    def step(self, flap_mask, dt=1):
+        """
+        Advance every game by one frame. flap_mask is a boolean array (or
+        scalar) of games whose player flaps this frame. Performs, in order,
+        the work of GameState.transition_state, the input handlers in main,
+        Game.update and Game.postupdate.
+        """
+        state = self.state
+        y = self.player_y
+        dy = self.player_dy
+
+        # Immediate transitions
+        state[:] = _TRANSITIONS[state]
+
+        # Input
+        state[
+            np.asarray(flap_mask, dtype=bool) &
+            in_group(state, FLAPPABLE).astype(bool)
+        ] = FLAP
+
+        self.time += dt/60
+        maingame = in_group(state, MAINGAME).astype(bool)
+
+        # Player
+        waiting = state == WAIT_FIRST_FLAP
+        y[waiting] = _hover_position(self.time[waiting])
+
+        moving = in_group(state, MOVING).astype(bool)
+        dy[state == FLAP] = Player.FLAP
+        state[(state == WAIT_RESET) & (y >= 1)] = RESET
+        dy[moving] += dt*Player.G
+        y[moving] += dt*dy[moving]
+        np.clip(y, 0, 1, out=y)
+
+        resetting = state == RESET
+        self.score[resetting] = 0
+        y[resetting] = _hover_position(self.time[resetting])
+
+        np.maximum(self.high_score, self.score, out=self.high_score)
+
+        # Columns and scoring
+        cx = self.column_x
+        cx[maingame] += dt*Column.DX
+
+        live = maingame[:, np.newaxis]
+        wrap = live & (cx + Column.W < 0)
+        scored = live & ~wrap & (cx <= Player.STARTX) & (
+            Player.STARTX <= cx + abs(dt*Column.DX)
+        )
+        cx[wrap] = 1
+        self.column_gap[wrap] = self._random_gaps(np.count_nonzero(wrap))
+        self.score += scored.sum(axis=1)
+        state[scored.any(axis=1)] = SCORE
+        state[maingame & self._collided()] = COLLISION
+
+        self.reset(resetting)
+
+        # Postupdate
+        dy[state == COLLISION] = 1.5*Player.FLAP
+
+    def _collided(self):
+        """Vectorized Game._collided. Return boolean array."""
+        x, y, w, h = Player.HITBOX
+        left = Player.STARTX + x
+        top = (self.player_y + y)[:, np.newaxis]
+        right = left + w
+        bottom = top + h
+        cx = self.column_x
+        gap = self.column_gap
+
+        hit = (
+            (cx + Column.INSET < right) & (left < cx + Column.W - Column.INSET)
+            & ((top < gap) | (bottom > gap + Column.GAP_H))
+        )
+        return (bottom[:, 0] >= Game.GROUND_Y) | hit.any(axis=1)
+
+    def _random_gaps(self, shape):
+        return self.rng.choice(Column.GAPS, size=shape)
+
+def _hover_position(t):
+    """Vectorized Player.hover_position."""
+    return Player.HOVERY + Player.HOVER_AMP*np.sin(Player.HOVER_FREQ*t)
@@ -9,43 +9,84 @@ PURPOSE:
   GameData exposes minimal needed information about the game data to ui
   update() methods.
 
+  Column state is stored by Game as arrays (structure of arrays) rather
+  than as one object per column, and GameData exposes them as read-only
+  ArrayViews, so reading the game state each frame creates no objects.
+  GameData.freeze() returns an immutable Snapshot for logging and
+  networking. For search, GameData.snapshot() instead packs the whole
+  state of a game and its GameState, including the column RNG and the
+  game clock, into a flat array('d') which restore() loads back.
+
+  Between flaps, y after n frames of dt is y + n*dt*dy + G*dt**2*n(n+1)/2
+  and columns move n*dt*Column.DX, so the frame of the next score,
+  collision or column wraparound can be computed in closed form.
+  GameData.advance() uses this to skip the frames in between instead of
+  stepping them. Column x is still summed frame by frame when skipping, as
+  columns are spaced to reach the scoring line exactly, and must round the
+  same way as when stepped.
+
 USAGE:
   External users should use only a GameData instance. GameData is available
   via the package's __init__.py.
 """
-from math import ceil, sin
-from time import clock
+from array import array
+from collections import namedtuple
+from math import ceil, inf, sin, sqrt
+from random import Random
+
+# See GameData.observation
+Observation = namedtuple('Observation', 'y dy column_dx column_gap')
 
-from adamlib.game.utilclasses import Base2dObject
+# See GameData.freeze
+Snapshot = namedtuple('Snapshot',
+    'time player_y player_dy score high_score column_x column_gap'
+)
 
-class Column(Base2dObject):
+class ArrayView:
     """
-    Defines a column obstacle. For now, the opening for the player to pass
-    through is handled by the UI. update() should be called once per frame
-    by the Game instance.
+    Read-only sequence view of an array.array, which reflects later
+    changes to it. Iterating the view iterates the array directly.
+    """
+    __slots__ = ('_array',)
 
-    ATTRIBUTES:
-      DX - Change in x per frame at 60fps
-      W  - Column width
+    def __init__(self, array):
+        self._array = array
 
-    INHERITED ATTRIBUTES:
-      x, y, pos
+    def __getitem__(self, index):
+        return self._array[index]
 
-    METHODS:
-      update
+    def __iter__(self):
+        return iter(self._array)
+
+    def __len__(self):
+        return len(self._array)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._array.tolist())
+
+class Column:
+    """
+    Defines the column obstacles, each with an opening for the player to
+    pass through. The x and gap of each column are stored in the arrays
+    Game.column_x and Game.column_gap; every column's y is 0.
+
+    ATTRIBUTES:
+      DX    - Change in x per frame at 60fps
+      GAP_H - Height of the opening
+      GAPS  - Possible values of gap, the y of the top of the opening
+      INSET - Horizontal margin between column edges and its solid part
+      W     - Column width
+
+    W, GAP_H and INSET are sizes at the reference tile size Game.TILE; a
+    Game scales them to its own (see Game).
     """
     DX = -0.0047
     W = 0.08 
-    
-    def __init__(self, startx):
-        super().__init__(startx, 0)
-    
-    def update(self, gamestate, dt):
-        gs = gamestate
-        if gs.state in gs.MAINGAME:
-            self.x = self.x + dt*self.DX
+    GAP_H = 0.303
+    GAPS = tuple(0.19 + i*(0.63 - 0.19)/15 for i in range(16))
+    INSET = 0.005
 
-class Player(Base2dObject):
+class Player:
     """
     Defines the player object. Game physics are handled here. update() should
     be called once per frame by the Game instance.
@@ -53,122 +94,517 @@ class Player(Base2dObject):
     ATTRIBUTES:
       G      - Gravity constant (per frame at 60fps)
       FLAP   - y velocity on a flap event
+      HITBOX - (x, y, w, h) of the collision box relative to position, at
+               the reference tile size Game.TILE
       STARTX
       STARTY
-
-    INHERITED ATTRIBUTES:
-      x, y, pos
+      HOVERY, HOVER_AMP, HOVER_FREQ - Idle hover used while waiting to start
+      dy
+      score
+      time   - Simulated seconds elapsed, which drives the idle hover. The
+               wall clock is not used so that a game can be replayed
+               exactly from its input.
+      x, y   - Position; y is kept in [0, 1]
 
     METHODS:
+      frames_until (classmethod)
       update
     """
+    __slots__ = ('x', 'y', 'dy', 'score', 'time')
     G = 0.0007 # Gravity constant
     FLAP = -0.012
+    HITBOX = (0, 0, 0.08, 0.062)
     STARTX = 0.15
     STARTY = 0.5
+    HOVERY = 0.3
+    HOVER_AMP = 0.05
+    HOVER_FREQ = 3
     
     def __init__(self):
-        super().__init__(self.STARTX, self.STARTY, miny=0, maxy=1)
+        self.x = self.STARTX
+        self.y = self.STARTY
         self.score = 0
         self.dy = 0
+        self.time = 0
 
     def update(self, gamestate, dt):
         gs = gamestate
+        self.time += dt/60
 
         if gs.state == gs.WAIT_FIRST_FLAP:
             self.y = self._default_position()
             
-        elif gs.state in gs.MAINGAME or gs.state == gs.WAIT_RESET:
+        elif gs.in_group(gs.MOVING):
             if gs.state == gs.FLAP:
                 self.dy = self.FLAP
                 
-            elif gs.state == gs.WAIT_RESET and self.y >= 1:
+            elif (gs.state == gs.WAIT_RESET and gs.tick_timer(dt/60) and
+                self.y >= 1
+            ):
                 gs.state = gs.RESET
 
             self.dy += dt*self.G
-            self.y += dt*self.dy
+            self.y = min(max(self.y + dt*self.dy, 0), 1)
             
         if gs.state == gs.RESET:
             self.score = 0
             self.y = self._default_position()
 
+    @classmethod
+    def frames_until(cls, y, dy, bound, dt=1, start=0, down=True):
+        """
+        Return the earliest time t >= start, in frames of dt from a player
+        at y with velocity dy that does not flap, at which its y is at
+        least bound (down=True) or at most bound (down=False); inf if never.
+
+        t is a float: y is the closed form trajectory extended between
+        frames, so the first frame at which the condition holds is never
+        before t. The clamp of y to [0, 1] is not applied.
+        """
+        # y(t) - bound = a*t**2 + b*t + c, negated to test for at most
+        a = cls.G*dt*dt/2
+        b = dt*dy + a
+        c = y - bound
+        if not down:
+            a, b, c = -a, -b, -c
+
+        if (a*start + b)*start + c >= 0:
+            return start
+
+        if a == 0:
+            return -c/b if b > 0 else inf
+
+        disc = b*b - 4*a*c
+        if disc < 0:
+            return inf
+
+        root = sqrt(disc)
+        for t in sorted(((-b - root)/(2*a), (-b + root)/(2*a))):
+            if t > start:
+                return t
+
+        return inf
+
     def _default_position(self):
-        return 0.3 + 0.05*sin(3*clock())
+        return self.hover_position(self.time)
+
+    @staticmethod
+    def hover_position(t):
+        """Return y of the idle hover (WAIT_FIRST_FLAP) at time t seconds."""
+        return Player.HOVERY + Player.HOVER_AMP*sin(Player.HOVER_FREQ*t)
 
 class Game:
     """
     ATTRIBUTES:
       column_dist - Distance between columns
+      column_gap  - array of y of the top of each column's opening
+      column_x    - array of x of each column
+      collision   - If True, update() detects collisions analytically from
+                    hitbox and column openings. Set False when the ui
+                    detects collisions itself.
+      GAPS_KEPT   - Max number of drawn openings kept; see rng
+      GROUND_Y    - y of the top of the ground at the reference tile size
       N_COLUMNS   - Max number of columns on screen at any time
+      rng         - random.Random used to pick column openings. The
+                    openings drawn are kept in order, as a byte each (an
+                    index of Column.GAPS), so the position in that
+                    sequence is all of the RNG state a snapshot needs.
+                    At most the last GAPS_KEPT are kept; restoring to an
+                    earlier position draws the sequence again from the
+                    seed.
+      SNAPSHOT_SIZE - Length of a snapshot() array
+      TILE        - Reference tile size (w, h): that of the ui's 64 px
+                    tiles at 800x600, which sizes in this module are
+                    measured from
+      tile        - Tile size of this game
+      column_w, column_inset, gap_h, hitbox, ground_y - Column.W,
+                    Column.INSET, Column.GAP_H, Player.HITBOX and GROUND_Y
+                    scaled from TILE to tile
+
+    The ui draws columns, player and ground from tiles of a fixed size in
+    pixels, so in game units they are smaller at higher resolutions. A
+    Game's geometry is scaled to match the tile size it is created with;
+    positions and speeds are not.
+
+    The column arrays are only ever changed in place, so views of them
+    stay valid.
     """
     COLUMN_DIST = 0.2
+    GAPS_KEPT = 4096
+    GROUND_Y = 0.893
     N_COLUMNS = ceil(1 / (Column.W + COLUMN_DIST))
-    
-    def __init__(self, high_score=0):
+    SNAPSHOT_SIZE = 10 + 2*N_COLUMNS
+    TILE = (64/800, 64/600)
+
+    def __init__(self, high_score=0, seed=None, collision=True, tile=TILE):
         self.player = Player()
         self.high_score = high_score
+        self.collision = collision
+        self.tile = tile
+
+        kx = tile[0] / self.TILE[0]
+        ky = tile[1] / self.TILE[1]
+        x, y, w, h = Player.HITBOX
+        self.column_w = kx*Column.W
+        self.column_inset = kx*Column.INSET
+        self.gap_h = ky*Column.GAP_H
+        self.hitbox = (kx*x, ky*y, kx*w, ky*h)
+        # The ground is a row of tiles at the bottom
+        self.ground_y = self.GROUND_Y + (1 - self.GROUND_Y)*(1 - ky)
+
+        # A random game still needs its seed to draw its openings again
+        self._seed = Random().getrandbits(64) if seed is None else seed
+        self.rng = Random(self._seed)
+        self.column_x = array('d', [0])*self.N_COLUMNS
+        self.column_gap = array('d', [0])*self.N_COLUMNS
+        self._gaps = array('B') # Openings drawn, as Column.GAPS indices
+        self._gaps_start = 0 # Position in the sequence of _gaps[0]
+        self._n_gaps = 0 # Number of openings used
         self.reset()
 
     def reset(self):
-        self.columns = []
         for i in range(self.N_COLUMNS):
-            self.columns.append(Column(1 + i*(Column.W + self.COLUMN_DIST)))
-
-        self.player.pos = (Player.STARTX, Player.STARTY)
+            self.column_x[i] = 1 + i*(Column.W + self.COLUMN_DIST)
+            self.column_gap[i] = self._next_gap()
+
+        self.player.x = Player.STARTX
+        self.player.y = Player.STARTY
+
+    def advance(self, gamestate, frames, dt=1):
+        """
+        Advance up to frames frames with no flap, with the same result as
+        calling transition_state(), update() and postupdate() for each
+        (to within rounding). Frames in which nothing can happen but motion
+        are skipped in closed form, then the next frame is stepped as usual.
+        Return the number of frames advanced: at most frames, and at least
+        1 if frames > 0.
+
+        Call again until the frame of the next flap. Return values are
+        small while something happens every frame. WAIT_RESET is always
+        stepped: its reset frame depends on exactly when the timer runs out
+        and y reaches the bottom, which the closed form may round across.
+        """
+        gs = gamestate
+        n = 0
+        if gs.state in (gs.WAIT_FIRST_FLAP, gs.DEFAULT):
+            n = min(self._quiet_frames(gs, dt), frames)
+            if n > 0:
+                self._skip(gs, n, dt)
+
+        if n < frames:
+            gs.transition_state()
+            self.update(gs, dt)
+            self.postupdate(gs, dt)
+            n += 1
+
+        return n
+
+    def next_column(self):
+        """
+        Return the index of the nearest column the player has not yet
+        passed, or None.
+        """
+        px = self.player.x
+        nearest = None
+        for i, x in enumerate(self.column_x):
+            if (px <= x + self.column_w and
+                (nearest is None or x < self.column_x[nearest])
+            ):
+                nearest = i
+
+        return nearest
 
     def postupdate(self, gamestate, dt):
         gs = gamestate
         if gs.state == gs.COLLISION:
             self.player.dy = 1.5*self.player.FLAP
 
+    def restore(self, gamestate, snapshot):
+        """
+        Restore gamestate and the game to snapshot, an array returned by
+        snapshot() of this game or of one created with the same seed and
+        collision.
+        """
+        gs = gamestate
+        player = self.player
+        n = self.N_COLUMNS
+        (player.time, player.x, player.y, player.dy, score, high_score,
+            n_gaps, state, previous, gs.timer) = snapshot[:10]
+
+        player.score = int(score)
+        self.high_score = int(high_score)
+        self._n_gaps = n_gaps = int(n_gaps)
+        end = self._gaps_start + len(self._gaps)
+        if not self._gaps_start <= n_gaps <= end:
+            # Skip to opening n_gaps, from the seed if it was dropped
+            if n_gaps < self._gaps_start:
+                self.rng.seed(self._seed)
+                end = 0
+            for i in range(n_gaps - end):
+                self.rng.randrange(len(Column.GAPS))
+            self._gaps = array('B')
+            self._gaps_start = n_gaps
+
+        gs.state = int(state)
+        gs.previous = None if previous < 0 else int(previous)
+
+        self.column_x[:] = snapshot[10:10 + n]
+        self.column_gap[:] = snapshot[10 + n:]
+
+    def snapshot(self, gamestate):
+        """
+        Return the state of the game and of gamestate (except for its
+        kwargs and reset_delay) as an array('d') of SNAPSHOT_SIZE, for
+        restore().
+        """
+        gs = gamestate
+        player = self.player
+        data = array('d', (player.time, player.x, player.y, player.dy,
+            player.score, self.high_score, self._n_gaps, gs.state,
+            -1 if gs.previous is None else gs.previous, gs.timer
+        ))
+        data += self.column_x
+        data += self.column_gap
+        return data
+
     def update(self, gamestate, dt):
         gs = gamestate
         self.player.update(gamestate, dt)
 
         if self.player.score > self.high_score:
             self.high_score = self.player.score
-        
-        for c in self.columns:
-            c.update(gamestate, dt)
-
-        if gs.state in gs.MAINGAME:
-            for c in self.columns:
-                scoremin = c.x
-                scoremax = scoremin + abs(dt*c.DX)
-                if c.x + c.W < 0:
-                    c.x = 1
-                elif scoremin <= self.player.x <= scoremax:
+
+        if gs.in_group(gs.MAINGAME):
+            column_x = self.column_x
+            dx = dt*Column.DX
+            for i, x in enumerate(column_x):
+                column_x[i] = x + dx
+
+            px = self.player.x
+            for i, x in enumerate(column_x):
+                if x + self.column_w < 0:
+                    column_x[i] = 1
+                    self.column_gap[i] = self._next_gap()
+                elif x <= px <= x + abs(dx):
                     gs.state = gs.SCORE
                     self.player.score += 1
+
+            if self.collision and self._collided():
+                gs.state = gs.COLLISION
                     
         elif gs.state == gs.RESET:
             self.reset()
 
+    def _collided(self):
+        """
+        Return True if the player's hitbox touches the ground or the solid
+        part of any column.
+        """
+        x, y, w, h = self.hitbox
+        left = self.player.x + x
+        top = self.player.y + y
+        right = left + w
+        bottom = top + h
+
+        if bottom >= self.ground_y:
+            return True
+
+        inset = self.column_inset
+        for cx, gap in zip(self.column_x, self.column_gap):
+            if (cx + inset < right and
+                left < cx + self.column_w - inset and
+                (top < gap or bottom > gap + self.gap_h)
+            ):
+                return True
+
+        return False
+
+    def _next_gap(self):
+        """Return the next column opening of the sequence drawn from rng."""
+        i = self._n_gaps - self._gaps_start
+        if i == len(self._gaps):
+            if i >= self.GAPS_KEPT:
+                # Drop the older half
+                del self._gaps[:i//2]
+                self._gaps_start += i//2
+                i -= i//2
+            self._gaps.append(self.rng.randrange(len(Column.GAPS)))
+
+        gap = Column.GAPS[self._gaps[i]]
+        self._n_gaps += 1
+        return gap
+
+    def _quiet_frames(self, gamestate, dt):
+        """
+        Return the number of frames from now, in DEFAULT or WAIT_FIRST_FLAP
+        with no flap, before the first one in which anything may happen
+        other than motion: a score, collision, column wraparound or clamp
+        of y. Times are rounded down a frame further, to
+        allow for rounding errors in the closed form.
+        """
+        gs = gamestate
+        if gs.state == gs.WAIT_FIRST_FLAP:
+            return inf
+
+        player = self.player
+        y = player.y
+        dy = player.dy
+        speed = -dt*Column.DX
+        hx, hy, w, h = self.hitbox
+        left = player.x + hx
+        right = left + w
+
+        t = min(Player.frames_until(y, dy, 1, dt, 1),
+            Player.frames_until(y, dy, 0, dt, 1, down=False)
+        )
+        if self.collision:
+            t = min(t,
+                Player.frames_until(y, dy, self.ground_y - hy - h, dt, 1)
+            )
+
+        for cx, gap in zip(self.column_x, self.column_gap):
+            # Wraparound, then score
+            t = min(t, (cx + self.column_w)/speed)
+            if cx > player.x:
+                t = min(t, (cx - player.x)/speed)
+
+            if not self.collision:
+                continue
+
+            # While the hitbox overlaps the solid part of the column, the
+            # frames in which y leaves the opening
+            start = max((cx + self.column_inset - right)/speed, 1)
+            end = (cx + self.column_w - self.column_inset - left)/speed
+            if start <= end:
+                hit = min(
+                    Player.frames_until(y, dy, gap - hy, dt, start,
+                        down=False
+                    ),
+                    Player.frames_until(y, dy, gap + self.gap_h - hy - h,
+                        dt, start
+                    ),
+                )
+                if hit <= end:
+                    t = min(t, hit)
+
+        return max(int(t) - 1, 0)
+
+    def _skip(self, gamestate, n, dt):
+        """
+        Advance n frames in which nothing happens but motion (see
+        _quiet_frames()).
+        """
+        gs = gamestate
+        player = self.player
+        player.time += n*dt/60
+
+        if gs.state == gs.WAIT_FIRST_FLAP:
+            player.y = player.hover_position(player.time)
+            return
+
+        player.y += n*dt*player.dy + Player.G*dt*dt*n*(n + 1)/2
+        player.dy += n*dt*Player.G
+
+        # See module docstring
+        column_x = self.column_x
+        dx = dt*Column.DX
+        for i, x in enumerate(column_x):
+            for j in range(n):
+                x += dx
+            column_x[i] = x
+
 class GameData:
     """
     The interface for main to the game subpackage. Exposes minimal
     information about the current state of the game data to main and ui.
 
     ATTRIBUTES (all read-only):
-      column_positions - Tuple of position tuples
+      column_gaps      - ArrayView of y of the top of each column opening
+      column_positions - Tuple of position tuples. Creates new tuples on
+                         every access; prefer column_x.
+      column_x         - ArrayView of x of each column
+      gap_values       - Tuple of all possible values in column_gaps
       high_score
       player_position  - Position tuple
       n_columns
+      observation      - Observation of the player's y and dy, and the x
+                         relative to the player and gap of the next column.
+                         If no column is ahead, a centered opening 1 away
+                         is reported.
       score
       scroll_speed     - See Column.DX
+      tile             - Tile size the geometry is scaled to; see Game
+
+    The ArrayViews are created once and always show the current state.
     """
-    def __init__(self, high_score):
-        self._game = Game(high_score)
+    def __init__(self, high_score, seed=None, collision=True,
+        tile=Game.TILE
+    ):
+        self._game = Game(high_score, seed, collision, tile)
+        self._column_x = ArrayView(self._game.column_x)
+        self._column_gaps = ArrayView(self._game.column_gap)
+
+    def advance(self, gamestate, frames, dt=1):
+        """See Game.advance."""
+        return self._game.advance(gamestate, frames, dt)
+
+    def freeze(self):
+        """Return an immutable Snapshot of the current game data."""
+        game = self._game
+        player = game.player
+        return Snapshot(player.time, player.y, player.dy, player.score,
+            game.high_score, tuple(game.column_x), tuple(game.column_gap)
+        )
+
+    def observe(self, out):
+        """
+        Write the fields of observation, in order, into out (any mutable
+        sequence of length 4) and return it. Unlike observation, no new
+        object is created, so out may be a reused buffer.
+        """
+        game = self._game
+        player = game.player
+        i = game.next_column()
+        out[0] = player.y
+        out[1] = player.dy
+        if i is None:
+            out[2] = 1
+            out[3] = (1 - game.gap_h)/2
+        else:
+            out[2] = game.column_x[i] - player.x
+            out[3] = game.column_gap[i]
+
+        return out
 
     def postupdate(self, gamestate, dt):
         self._game.postupdate(gamestate, dt)
 
+    def restore(self, gamestate, snapshot):
+        """See Game.restore."""
+        self._game.restore(gamestate, snapshot)
+
+    def snapshot(self, gamestate):
+        """See Game.snapshot."""
+        return self._game.snapshot(gamestate)
+
     def update(self, gamestate, dt):
         self._game.update(gamestate, dt)
 
+    @property
+    def column_gaps(self):
+        return self._column_gaps
+
     @property
     def column_positions(self):
-        return tuple(c.pos for c in self._game.columns)
+        return tuple((x, 0) for x in self._game.column_x)
+
+    @property
+    def column_x(self):
+        return self._column_x
+
+    @property
+    def gap_values(self):
+        return Column.GAPS
 
     @property
     def high_score(self):
@@ -176,12 +612,17 @@ class GameData:
 
     @property
     def player_position(self):
-        return self._game.player.pos
+        player = self._game.player
+        return (player.x, player.y)
 
     @property
     def n_columns(self):
         return Game.N_COLUMNS
 
+    @property
+    def observation(self):
+        return Observation(*self.observe([0, 0, 0, 0]))
+
     @property
     def score(self):
         return self._game.player.score
@@ -190,3 +631,6 @@ class GameData:
     def scroll_speed(self):
         return Column.DX
 
+    @property
+    def tile(self):
+        return self._game.tile
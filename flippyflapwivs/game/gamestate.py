@@ -5,6 +5,8 @@ Author: Adam Beagle
 PURPOSE:
   Contains GameState class, which defines and handles sets and
   transitions of game state. See docs of adamlib.game.gamestate for more.
+  The states, their groups and transitions are defined in the states
+  module.
 
 USAGE:
   Main should instantiate a single GameState object for use throughout all
@@ -18,48 +20,72 @@ USAGE:
 
     # Another way
     gs.set(gs.STATE1, some_arg='something')
-    
+
+  Groups of states (e.g. gs.MAINGAME) are bitmasks, tested with
+  gs.in_group(gs.MAINGAME).
+
+  After a collision, WAIT_RESET lasts until the player has fallen to the
+  ground and at least reset_delay seconds of game time have passed, e.g.
+  while the collision sound plays. The wait is timed by the game, with
+  start_timer() and tick_timer(), so the game loop never blocks.
 """
-import pygame
 from adamlib.game.gamestate import GameState as BaseGameState
 
+from . import states
+
 class GameState(BaseGameState):
     """
     GameState for FlippyFlapWivs.
 
     See docs/state_flow.png for visual representation of state flow.
     See adamlib.game.gamestate docstrings for base class details.
+
+    ATTRIBUTES:
+      ALL, FLAPPABLE, MAINGAME, MOVING, NOMOVE - Groups; see states module
+      reset_delay - Min seconds of game time from a collision to the reset
+      timer       - Seconds left on the timer
     """
-    def __init__(self):
-        states = (
-            'WAIT_FIRST_FLAP',
-            'DEFAULT',
-            'FLAP',
-            'SCORE',
-            'COLLISION',
-            'WAIT_RESET',
-            'RESET',
-            'PAUSE',
-            'QUIT',
-        )
-
-        super().__init__(*states)
+    ALL = states.ALL
+    FLAPPABLE = states.FLAPPABLE
+    MAINGAME = states.MAINGAME
+    MOVING = states.MOVING
+    NOMOVE = states.NOMOVE
+
+    def __init__(self, reset_delay=0):
+        super().__init__(*states.NAMES)
+        # The codes are those of the states module, which groups and
+        # TRANSITIONS index, whatever the base class numbered them
+        for code, name in enumerate(states.NAMES):
+            setattr(self, name, code)
         self.state = self.WAIT_FIRST_FLAP
 
-        # Define ranges
-        self.MAINGAME = tuple(range(self.DEFAULT, self.COLLISION + 1))
-        self.NOMOVE = (self.COLLISION, self.WAIT_RESET)
+        self.reset_delay = reset_delay
+        self.timer = 0
+
+    def in_group(self, group):
+        """Return True if the current state is in group."""
+        return (group >> self.state) & 1 == 1
+
+    def start_timer(self, seconds):
+        self.timer = seconds
+
+    def tick_timer(self, seconds):
+        """
+        Advance the timer by seconds of game time. Return True once it has
+        run out.
+        """
+        self.timer = max(self.timer - seconds, 0)
+        return self.timer == 0
 
     def transition_state(self):
         """
         All immediate transitions (i.e. always happen on the next
         frame) should occur here.
         """
-        if self.state in (self.FLAP, self.SCORE):
-            self.state = self.DEFAULT
-        elif self.state == self.COLLISION:
-            self.state = self.WAIT_RESET
-        elif self.state == self.RESET:
-            self.state = self.WAIT_FIRST_FLAP
+        state = states.TRANSITIONS[self.state]
+        if state != self.state:
+            self.state = state
+            if state == self.WAIT_RESET:
+                self.start_timer(self.reset_delay)
 
         
@@ -0,0 +1,86 @@
+"""
+states.py
+Author: Adam Beagle
+
+PURPOSE:
+  The single definition of the game states, shared by GameState and the
+  batch engine. Like the rest of the game subpackage, nothing here touches
+  pygame.
+
+  Each state is a small int code. Groups of states are bitmasks with bit
+  (1 << state) set for each member, so testing membership is one shift and
+  mask, for a single state or (with NumPy) an array of them:
+
+    in_group(state, MAINGAME)
+
+  TRANSITIONS is indexed by state and gives the state at the start of the
+  next frame (see GameState.transition_state), so a NumPy array of it
+  transitions a whole array of states with one lookup.
+
+  handler_table() compiles (handler, group) registrations into a table
+  indexed by state, so that a subsystem calls only the handlers of the
+  current state each frame, without testing each one.
+
+CONTENTS:
+  NAMES, state codes, groups, TRANSITIONS
+  handler_table
+  in_group
+  mask
+"""
+NAMES = (
+    'WAIT_FIRST_FLAP',
+    'DEFAULT',
+    'FLAP',
+    'SCORE',
+    'COLLISION',
+    'WAIT_RESET',
+    'RESET',
+    'PAUSE',
+    'QUIT',
+)
+
+(WAIT_FIRST_FLAP, DEFAULT, FLAP, SCORE, COLLISION, WAIT_RESET, RESET, PAUSE,
+    QUIT) = range(len(NAMES))
+
+def mask(*states):
+    """Return the group (bitmask) of states."""
+    group = 0
+    for state in states:
+        group |= 1 << state
+    return group
+
+def in_group(state, group):
+    """
+    Return nonzero if state is in group. state may also be a NumPy integer
+    array, giving an array of 0 and 1.
+    """
+    return (group >> state) & 1
+
+# Groups
+ALL = mask(*range(len(NAMES)))
+MAINGAME = mask(DEFAULT, FLAP, SCORE, COLLISION)
+NOMOVE = mask(COLLISION, WAIT_RESET) # Input and scrolling stopped
+MOVING = MAINGAME | mask(WAIT_RESET) # Player falls under gravity
+FLAPPABLE = mask(WAIT_FIRST_FLAP, DEFAULT) # States a flap input applies in
+
+# Immediate transitions: TRANSITIONS[state] is the state on the next frame
+_transitions = {
+    FLAP : DEFAULT,
+    SCORE : DEFAULT,
+    COLLISION : WAIT_RESET,
+    RESET : WAIT_FIRST_FLAP,
+}
+TRANSITIONS = tuple(_transitions.get(s, s) for s in range(len(NAMES)))
+
+def handler_table(registrations):
+    """
+    Return a tuple, indexed by state, of the tuple of handlers to call in
+    that state. registrations is an iterable of (handler, group); handlers
+    keep their order within each state.
+    """
+    registrations = list(registrations)
+    return tuple(
+        tuple(handler for handler, group in registrations
+            if in_group(state, group)
+        ) for state in range(len(NAMES))
+    )
@@ -0,0 +1,178 @@
+"""
+headless.py
+Author: Adam Beagle
+
+PURPOSE:
+  Runs the game loop with no display or audio, as fast as the CPU allows.
+  Only the game subpackage is used; pygame is never initialized.
+
+  Input comes from an input source object, which must provide a
+  flap(frame, gamedata) method returning True if the player should flap on
+  the given frame.
+
+  Event-driven runs (see run()) skip the frames between flaps and game
+  events in closed form with GameData.advance(). Their input source must
+  also provide next_flap(frame, gamestate, gamedata, dt), returning the
+  first frame from frame on which flap() might return True (it may be
+  early, but never late), or inf if none.
+
+CONTENTS:
+  AutopilotInput
+  ScriptedInput
+  idle_frames
+  report
+  run
+  step
+"""
+from bisect import bisect_left
+from math import inf
+from time import perf_counter
+
+from game.gamedata import Column, Player
+
+class AutopilotInput:
+    """
+    Flaps whenever the player falls below a target y: target_y of the way
+    down the opening of the next column. While no column is on screen, the
+    game is waiting for its first flap, and that flap is made at once.
+    Instances may also be called with a GameData.observation, so can be
+    used as a policy (see evaluate.py).
+    """
+    def __init__(self, target_y=0.75):
+        self.target_y = target_y
+
+    def __call__(self, observation):
+        obs = observation
+        if Player.STARTX + obs.column_dx >= 1:
+            return True
+
+        return obs.y + Player.HITBOX[3] > (
+            obs.column_gap + self.target_y*Column.GAP_H
+        )
+
+    def flap(self, frame, gamedata):
+        return self(gamedata.observation)
+
+    def next_flap(self, frame, gamestate, gamedata, dt=1):
+        """
+        Predict from the player's trajectory when it falls below the
+        target, or the next column is passed and the target changes. No
+        prediction is made while the player hovers before the first flap.
+        """
+        gs = gamestate
+        if not gs.in_group(gs.MAINGAME):
+            return frame
+
+        obs = gamedata.observation
+        t = min(
+            Player.frames_until(obs.y, obs.dy, obs.column_gap +
+                self.target_y*Column.GAP_H - Player.HITBOX[3], dt
+            ),
+            (obs.column_dx + Column.W) / (-dt*Column.DX),
+        )
+        return frame + max(int(t) - 1, 0)
+
+class ScriptedInput:
+    """
+    Flaps on a fixed set of frame indices. Use from_file() to read indices
+    from a text file containing one frame index per line.
+    """
+    def __init__(self, frames):
+        self.frames = frozenset(frames)
+        self._sorted = sorted(self.frames)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(int(line) for line in f if line.strip())
+
+    def flap(self, frame, gamedata):
+        return frame in self.frames
+
+    def next_flap(self, frame, gamestate, gamedata, dt=1):
+        i = bisect_left(self._sorted, frame)
+        return self._sorted[i] if i < len(self._sorted) else inf
+
+def idle_frames(gamestate, gamedata, inputs, frame, dt=1):
+    """
+    Return the number of frames from frame, possibly inf, which can be
+    skipped with GameData.advance() because input cannot change them:
+    either inputs will not flap, or a flap would be ignored.
+    """
+    gs = gamestate
+    if gs.in_group(gs.NOMOVE):
+        return inf
+    if gs.state == gs.RESET:
+        return 0
+    return inputs.next_flap(frame, gs, gamedata, dt) - frame
+
+def step(gamestate, gamedata, flap, dt=1, log=None):
+    """
+    Advance one frame: transition state, apply flap input if given,
+    then update and postupdate gamedata. If log (a replay.InputLog) is
+    given, the input is recorded to it.
+    """
+    gs = gamestate
+    gs.transition_state()
+
+    if flap and gs.in_group(gs.FLAPPABLE):
+        gs.state = gs.FLAP
+
+    if log is not None:
+        log.record_input(gs, dt)
+
+    gamedata.update(gs, dt)
+    gamedata.postupdate(gs, dt)
+
+def run(gamestate, gamedata, inputs, frames, dt=1, log=None,
+        event_driven=False
+    ):
+    """
+    Run frames frames with input from inputs, recording it to log if given
+    (see step()). Return a dict of throughput statistics (see report()).
+
+    If event_driven, frames in which nothing happens are skipped (see
+    module docstring). This cannot be recorded to a log.
+    """
+    if event_driven and log is not None:
+        raise ValueError('An event-driven run cannot be logged')
+
+    gs = gamestate
+    games = 0
+    best = 0
+    frame = 0
+
+    start = perf_counter()
+    while frame < frames:
+        n = 0
+        if event_driven:
+            n = min(idle_frames(gs, gamedata, inputs, frame, dt),
+                frames - frame
+            )
+
+        if n > 0:
+            frame += gamedata.advance(gs, n, dt)
+        else:
+            step(gs, gamedata, inputs.flap(frame, gamedata), dt, log)
+            frame += 1
+
+        if gs.state == gs.RESET:
+            games += 1
+        elif gamedata.score > best:
+            best = gamedata.score
+    elapsed = perf_counter() - start
+
+    return {
+        'frames' : frames,
+        'seconds' : elapsed,
+        'fps' : frames / elapsed if elapsed else float('inf'),
+        'games' : games,
+        'best_score' : best,
+    }
+
+def report(stats):
+    """Print statistics returned by run()."""
+    print(
+        '{frames} frames in {seconds:.3f}s ({fps:.0f} frames/s), '
+        '{games} games, best score {best_score}'.format(**stats)
+    )
@@ -12,6 +12,7 @@ USAGE:
 """
 from argparse import ArgumentParser
 from os import environ, path
+from random import randrange
 from sys import path as syspath
 
 from adamlib.util.file_util import PersistentData
@@ -27,15 +28,37 @@ except ImportError:
     from flippyflapwivs import CONFIG
     
 from game import GameData, GameState
-from ui import UIManager
+from profiler import FrameTimer
+from recorder import FrameRecorder
+from scheduler import FrameSkipper
+from replay import InputLog
+from ui import UIManager, game_tile_size
+import headless
+import replay
 
 DATA_PATH = path.abspath(path.join(path.dirname(__file__), 'res', 'data.dat'))
 
+# Longest real frame time consumed by the simulation, in seconds. Time beyond
+# this is dropped so a long stall cannot trigger a burst of catch-up ticks.
+MAX_FRAME_TIME = 0.25
+
 def main():
-    parse_args() # Sets CONFIG options.
-                 # Must be called before UIManager instantiated.
+    args = parse_args() # Sets CONFIG options.
+                        # Must be called before UIManager instantiated.
+
+    if args.replay:
+        main_replay(args)
+        return
+
+    if args.headless:
+        main_headless(args)
+        return
     
-    pygame.init()
+    # The mixer is only initialized if audio is used; see ui.AudioPlayer
+    pygame.display.init()
+    if not CONFIG.MUTE:
+        pygame.mixer.init()
+
     pygame.display.set_caption('Flippyflap Wivs')
     environ['SDL_VIDEO_WINDOW_POS'] = 'center'
 
@@ -47,11 +70,31 @@ def main():
         pd.high_score = 0
     
     clock = pygame.time.Clock()
-    dt = 1
-    gdt = 60 / CONFIG.FPS_LIMIT
+    tick = 1 / CONFIG.TICK_RATE # Seconds per simulation step
+    gdt = 60 / CONFIG.TICK_RATE # Game dt, in frames at 60fps
+    accumulator = 0
     gs = GameState()
-    gd = GameData(pd.high_score)
-    uim = UIManager(gd.n_columns, gdt*gd.scroll_speed)
+    gd = GameData(pd.high_score, args.seed,
+        collision=not CONFIG.PRECISE_COLLISION, tile=game_tile_size()
+    )
+    timer = FrameTimer()
+    skipper = FrameSkipper(CONFIG.FPS_LIMIT, args.max_frame_skip)
+    recorder = None
+    if args.record is not None:
+        recorder = FrameRecorder(args.record, args.record_format,
+            CONFIG.FPS_LIMIT
+        )
+    uim = UIManager(
+        gd.n_columns, gdt*gd.scroll_speed, gd.gap_values, gd.high_score,
+        timer
+    )
+    # The delay is set once, so toggling mute does not change it
+    gs.reset_delay = uim.reset_delay
+    log = None
+    if args.record_input is not None:
+        log = InputLog(args.seed, collision=not CONFIG.PRECISE_COLLISION,
+            reset_delay=gs.reset_delay, tile=gd.tile
+        )
     end = False
 
     # Prep for game loop
@@ -61,50 +104,158 @@ def main():
         (pygame.KEYDOWN, pygame.QUIT, pygame.MOUSEBUTTONDOWN)
     )
 
-    # Game loop
-    while not end:
-        # Transition state
-        gs.transition_state()
-        
-        # Handle Events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+    # Game loop. The simulation runs at a fixed CONFIG.TICK_RATE regardless
+    # of render rate: each frame, real elapsed time is accumulated and
+    # consumed in whole ticks. While frames run over budget, drawing is
+    # skipped (see FrameSkipper) so the ticks keep up. Each phase is timed
+    # by timer.
+    try:
+        while not end:
+            # Handle Events
+            with timer.phase('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        end = True
+                    elif event.type == pygame.KEYDOWN:
+                        handle_event_keydown(gs, event)
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        handle_event_mousebuttondown(gs, event)
+
+            if gs.state == gs.QUIT:
                 end = True
-            elif event.type == pygame.KEYDOWN:
-                handle_event_keydown(gs, event)
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                handle_event_mousebuttondown(gs, event)
 
-        if gs.state == gs.QUIT:
-            end = True
+            # Run no ticks after quitting, so an input log ends on the last
+            # frame actually played and replays as recorded.
+            if end:
+                break
+
+            if gs.state == gs.PAUSE:
+                accumulator = 0
+            else:
+                # Update
+                frame_time = clock.get_time() / 1000
+                accumulator += min(frame_time, MAX_FRAME_TIME)
+                while accumulator >= tick:
+                    if log is not None:
+                        log.record_input(gs, gdt)
+                    with timer.phase('gd.update'):
+                        gd.update(gs, gdt)
+                    with timer.phase('uim.update'):
+                        uim.update(gs, gd, 1)
+                    if log is not None:
+                        log.record_collision(gs)
+                    with timer.phase('gd.postupdate'):
+                        gd.postupdate(gs, gdt)
+                    with timer.phase('transition_state'):
+                        gs.transition_state()
+                    accumulator -= tick
 
-        if gs.state != gs.PAUSE:
-            # Update
-            gd.update(gs, gdt)
-            uim.update(gs, gd, dt)
-            gd.postupdate(gs, gdt)
+                # Draw
+                if skipper.should_draw(frame_time):
+                    with timer.phase('draw'):
+                        uim.draw(
+                            accumulator / tick if CONFIG.INTERPOLATE else None
+                        )
 
-            # Draw
-            uim.draw()
+                    if recorder is not None:
+                        with timer.phase('record'):
+                            if not recorder.capture(uim.screen):
+                                timer.count('record_dropped')
+                else:
+                    timer.count('frames_skipped')
 
-        # Cleanup
-        clock.tick(CONFIG.FPS_LIMIT)
-        fps = clock.get_fps()
-        gdt = 60 / (fps if fps > 15 else CONFIG.FPS_LIMIT)                                       
-        dt = fps / CONFIG.FPS_LIMIT
-        pygame.event.pump()
+            # Cleanup. No need to wait for the frame limit when behind.
+            with timer.phase('tick'):
+                clock.tick(0 if skipper.run else CONFIG.FPS_LIMIT)
+            pygame.event.pump()
+            timer.end_frame()
+    finally:
+        # Also on an exception or Ctrl-C, so queued frames are written and
+        # the writer thread stops
+        if recorder is not None:
+            recorder.close()
 
+    if args.profile is not None:
+        timer.export(args.profile)
+
+    if log is not None:
+        log.finish(gd)
+        log.save(args.record_input)
 
     # Save high score
     pd.high_score = gd.high_score
     pd.save()
     pygame.quit()
 
+def main_headless(args):
+    """
+    Run the game with no display or audio for args.frames frames, then
+    report throughput. High score is neither loaded nor saved.
+    """
+    if args.script is not None:
+        inputs = headless.ScriptedInput.from_file(args.script)
+    else:
+        inputs = headless.AutopilotInput()
+
+    gd = GameData(0, args.seed)
+    log = None
+    if args.record_input is not None:
+        log = InputLog(args.seed)
+
+    stats = headless.run(GameState(), gd, inputs, args.frames, log=log,
+        event_driven=args.event_driven
+    )
+    headless.report(stats)
+
+    if log is not None:
+        log.finish(gd)
+        log.save(args.record_input)
+
+def main_replay(args):
+    """
+    Replay each input log in args.replay as fast as possible, drawing it
+    unless args.headless, and report whether each reproduced its recorded
+    result. Exit with status 1 if any did not.
+    """
+    ok = True
+    uim = None
+
+    for log_path in args.replay:
+        log = InputLog.load(log_path)
+        gd = GameData(0, log.seed, log.collision, log.tile)
+
+        if not args.headless:
+            if uim is None:
+                pygame.display.init()
+                pygame.display.set_caption('Flippyflap Wivs (replay)')
+                pygame.event.set_allowed(None)
+                pygame.event.set_allowed(pygame.QUIT)
+            # Level scroll speed is per tick, so is set from the log's dt
+            # (any dt will do for a log of no ticks)
+            dt = log.dt_runs[0][1] if log.dt_runs else 60 / CONFIG.TICK_RATE
+            uim = UIManager(gd.n_columns, dt*gd.scroll_speed, gd.gap_values)
+
+        stats = replay.replay(log, GameState(log.reset_delay), gd, uim)
+        replay.report(log_path, stats)
+        ok = ok and stats['match'] is not False
+
+        if uim is not None and pygame.event.peek(pygame.QUIT):
+            break
+
+    if uim is not None:
+        pygame.quit()
+
+    if not ok:
+        raise SystemExit(1)
+
 def handle_event_keydown(gamestate, event):
     gs = gamestate
     if event.key == pygame.K_q:
         gs.state = gs.QUIT
         
+    elif event.key == pygame.K_t:
+        gs.kwargs['toggle_hud'] = True
+
     elif event.key == pygame.K_p:
         if gs.state == gs.PAUSE:
             gs.state = gs.previous
@@ -119,40 +270,134 @@ def handle_event_keydown(gamestate, event):
             CONFIG.MUTE = True
             gamestate.kwargs['mute'] = True
         
-    elif (gs.state in (gs.WAIT_FIRST_FLAP, gs.DEFAULT) and
-        event.key == pygame.K_SPACE
-    ):
+    elif gs.in_group(gs.FLAPPABLE) and event.key == pygame.K_SPACE:
         gs.state = gs.FLAP
 
 def handle_event_mousebuttondown(gamestate, event):
     gs = gamestate
-    if gs.state in (gs.WAIT_FIRST_FLAP, gs.DEFAULT) and event.button == 1:
+    if gs.in_group(gs.FLAPPABLE) and event.button == 1:
         gs.state = gs.FLAP
 
 def parse_args():
     """Parse command line args and instantiate CONFIG constants."""
     parser = ArgumentParser(description='Play FlippyFlap Wivs.')
     parser.add_argument('-f', '--fullscreen', action='store_true')
+    parser.add_argument('-d', '--dirty-rects', action='store_true',
+        help='Redraw and update only changed screen regions.'
+    )
     parser.add_argument('-r', '--resolution', nargs=2, type=int,
         default=(800, 600), help='Screen resolution in px: width height',
         metavar=('W', 'H')
     )
+    parser.add_argument('-l', '--logical-size', nargs=2, type=int,
+        help='Draw at this size in px (width height) and scale each frame '
+             'to the screen resolution.', metavar=('W', 'H')
+    )
+    parser.add_argument('--scale', choices=('integer', 'smooth'),
+        default='smooth',
+        help='How --logical-size frames are scaled to the screen: largest '
+             'integer multiple (sharp) or smooth scaling to fit '
+             '(default smooth).'
+    )
     parser.add_argument('--fps', type=int, default=120, choices=range(30, 121),
         metavar='int', help='int in [30, 121)'
     )
+    parser.add_argument('--max-frame-skip', type=int, default=0,
+        metavar='int',
+        help='While frames run over budget, skip drawing up to this many '
+             'frames in a row so the simulation keeps up (default 0, '
+             'never skip).'
+    )
+    parser.add_argument('-p', '--precise-collision', action='store_true',
+        help='Detect collisions per-pixel from sprite masks.'
+    )
+    parser.add_argument('--profile', metavar='PATH',
+        help='On exit, write frame phase timings to PATH (.json or .csv; '
+            'a CSV\'s counters go to PATH-counters.csv).'
+    )
+    parser.add_argument('--ring-level', action='store_true',
+        help='Draw the level from a single scrolling offscreen strip. '
+             'Incompatible with --precise-collision; --dirty-rects is '
+             'ignored.'
+    )
+    parser.add_argument('--tick-rate', type=int, choices=range(10, 241),
+        metavar='int', help='Simulation steps per second, int in [10, 241) '
+                            '(default is the FPS limit)'
+    )
+    parser.add_argument('-i', '--interpolate', action='store_true',
+        help='Draw moving sprites between simulation steps.'
+    )
     parser.add_argument('-m', '--mute', action='store_true',
         help="Disable sounds."
     )
+    parser.add_argument('--headless', action='store_true',
+        help='Run without display or audio as fast as possible.'
+    )
+    parser.add_argument('--frames', type=int, default=100000, metavar='int',
+        help='Number of frames to run in headless mode.'
+    )
+    parser.add_argument('--script', metavar='PATH',
+        help='Headless input: file of frame indices on which to flap. '
+             'If omitted, a simple autopilot flaps.'
+    )
+    parser.add_argument('--event-driven', action='store_true',
+        help='Headless: skip frames between flaps and game events in '
+             'closed form instead of simulating each one.'
+    )
+    parser.add_argument('--record', metavar='DIR',
+        help='Export every drawn frame to DIR from a background thread. '
+             'Frames are dropped rather than slowing the game.'
+    )
+    parser.add_argument('--record-format', default='png',
+        choices=FrameRecorder.FORMATS,
+        help='Frame export format: raw RGB file, PNG sequence, or piped to '
+             'ffmpeg (default png)'
+    )
+    parser.add_argument('--seed', type=int, metavar='int',
+        help='Seed for column openings (default is random).'
+    )
+    parser.add_argument('--record-input', metavar='PATH',
+        help='On exit, write a log of the input to PATH for --replay.'
+    )
+    parser.add_argument('--replay', nargs='+', metavar='PATH',
+        help='Replay input logs as fast as possible and check each '
+             'reproduces its recorded result. With --headless, nothing is '
+             'drawn.'
+    )
     args = parser.parse_args()
+
+    if args.replay and args.record_input:
+        parser.error('--replay and --record-input cannot be combined')
+
+    if args.event_driven and args.record_input:
+        parser.error('--event-driven and --record-input cannot be combined')
+
+    # A recorded game must have a known seed
+    if args.seed is None:
+        args.seed = randrange(2**32)
+
+    if args.ring_level and args.precise_collision:
+        parser.error('--ring-level requires game collision detection '
+                     '(no --precise-collision)')
     
+    CONFIG.DIRTY_RECTS = args.dirty_rects
     CONFIG.FPS_LIMIT = args.fps
     CONFIG.FULLSCREEN = args.fullscreen
-    CONFIG.MUTE = args.mute
+    CONFIG.INTERPOLATE = args.interpolate
+    CONFIG.MUTE = args.mute or bool(args.replay)
+    # Replays take collisions from the log, never from the ui
+    CONFIG.PRECISE_COLLISION = args.precise_collision and not args.replay
+    CONFIG.RENDER_SIZE = args.logical_size
+    CONFIG.RING_LEVEL = args.ring_level
+    CONFIG.SCALE_MODE = args.scale
     CONFIG.SCREEN_SIZE = args.resolution
+    CONFIG.TICK_RATE = args.tick_rate or args.fps
 
     # Lock CONFIG so options (except for mute) can no longer be set
     CONFIG.lock()
 
+    return args
+
 ###############################################################################
 if __name__ == '__main__':
     main()
@@ -0,0 +1,139 @@
+"""
+profiler.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains FrameTimer, which times named phases of each frame of the game
+  loop with a high-resolution clock and keeps rolling percentiles of each.
+
+USAGE:
+    timer = FrameTimer()
+    while running:
+        with timer.phase('update'):
+            update()
+        with timer.phase('draw'):
+            draw()
+        timer.end_frame()
+
+    timer.export('timings.csv') # and timings-counters.csv; or .json
+"""
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+import csv
+import json
+from os.path import splitext
+from time import perf_counter
+
+class FrameTimer:
+    """
+    Per-phase frame timings. A phase entered more than once in a frame
+    (e.g. one simulation step per tick) is summed for that frame, and a
+    known phase not entered in a frame counts as 0 for it. The total time
+    between end_frame() calls is recorded as phase 'frame'.
+
+    Only the last `window` frames are kept for percentiles. Counters (see
+    count()) are totals for the whole run.
+
+    METHODS:
+      count
+      end_frame
+      export
+      phase
+      summary
+    """
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, window=600):
+        self.window = window
+        self.counters = OrderedDict()
+        self.frames = 0
+        self._samples = OrderedDict()
+        self._current = {}
+        self._frame_start = perf_counter()
+
+    def count(self, name, n=1):
+        """Add n to counter name."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_frame(self):
+        """Record the current frame's phase times. Call once per frame."""
+        now = perf_counter()
+        self._current['frame'] = now - self._frame_start
+        self._frame_start = now
+
+        for name, t in self._current.items():
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.window)
+            self._samples[name].append(t)
+
+        for name, samples in self._samples.items():
+            if name not in self._current:
+                samples.append(0)
+
+        self._current.clear()
+        self.frames += 1
+
+    def export(self, path):
+        """
+        Write summary() to path, as JSON if path ends in .json, otherwise
+        CSV (one row per phase, times in ms). A CSV has one table, so the
+        frame count and counters are written to a second one beside it,
+        e.g. timings-counters.csv for timings.csv.
+        """
+        summary = self.summary()
+
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({
+                    'frames' : self.frames,
+                    'counters' : self.counters,
+                    'phases' : summary,
+                }, f, indent=2)
+            return
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            fields = ['mean'] + ['p{}'.format(p) for p in self.PERCENTILES]
+            writer.writerow(['phase'] + fields + ['max'])
+            for name, stats in summary.items():
+                writer.writerow(
+                    [name] + [stats[k] for k in fields] + [stats['max']]
+                )
+
+        root, ext = splitext(path)
+        with open(root + '-counters' + ext, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['counter', 'count'])
+            writer.writerow(['frames', self.frames])
+            for name, n in self.counters.items():
+                writer.writerow([name, n])
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager timing the enclosed block as phase name."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] = (
+                self._current.get(name, 0) + perf_counter() - start
+            )
+
+    def summary(self):
+        """
+        Return OrderedDict of phase name to dict of mean, pN for each of
+        PERCENTILES, and max, all in ms over the current window.
+        """
+        summary = OrderedDict()
+        for name, samples in self._samples.items():
+            ordered = sorted(samples)
+            n = len(ordered)
+            stats = OrderedDict(mean=1000*sum(ordered) / n)
+            for p in self.PERCENTILES:
+                stats['p{}'.format(p)] = 1000*ordered[
+                    min(n - 1, int(p*n / 100))
+                ]
+            stats['max'] = 1000*ordered[-1]
+            summary[name] = stats
+
+        return summary
@@ -0,0 +1,183 @@
+"""
+recorder.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains FrameRecorder, which exports frames to disk without stalling the
+  game loop. capture() only copies a finished frame's pixels into a queue
+  bounded by a memory budget; a writer thread encodes them. When the writer
+  falls behind and the queue is full, new frames are dropped and counted
+  rather than waited for.
+
+  Formats:
+    raw  - All frames appended to frames.rgb as packed 24-bit RGB
+    png  - One frame_NNNNNN.png per frame, numbered by frame captured, so
+           dropped frames leave gaps in the numbering
+    pipe - Raw frames written to the stdin of an encoder command (see
+           PIPE_COMMAND)
+
+  On close(), frames.json is written with the frame size, rate and counts
+  of frames written and dropped.
+
+USAGE:
+    recorder = FrameRecorder('out', 'png', fps=60)
+    while running:
+        draw(screen)
+        recorder.capture(screen)
+    recorder.close()
+"""
+import json
+import os
+from queue import Full, Queue
+import shlex
+import subprocess
+import threading
+
+import pygame
+
+# Default encoder command of the pipe format. Fields {w}, {h}, {fps} and
+# {dir} (shell-quoted) are filled in; raw RGB frames are written to its
+# stdin.
+PIPE_COMMAND = (
+    'ffmpeg -loglevel error -y -f rawvideo -pix_fmt rgb24 -s {w}x{h} '
+    '-r {fps} -i - -pix_fmt yuv420p {dir}/video.mp4'
+)
+
+class FrameRecorder:
+    """
+    Exports captured frames to directory path in format fmt (see module
+    docstring) from a writer thread.
+
+    ATTRIBUTES:
+      FORMATS  - Supported formats
+      captured - Number of frames passed to capture()
+      dropped  - Number of those not queued because the queue was full
+
+    METHODS:
+      capture
+      close
+    """
+    FORMATS = ('raw', 'png', 'pipe')
+
+    def __init__(self, path, fmt='png', fps=60, max_bytes=256*2**20,
+        command=PIPE_COMMAND
+    ):
+        """
+        max_bytes bounds the memory of queued frames: the queue holds as
+        many full frames as fit, but at least one. command is the encoder
+        of the pipe format.
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError('Unknown frame format {}'.format(fmt))
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.captured = 0
+        self.dropped = 0
+        self._command = command
+        self._max_bytes = max_bytes
+        self._size = None
+        self._queue = None # Created for the frame size by the first capture
+        self._thread = None
+
+    def capture(self, surface):
+        """
+        Queue a copy of surface's pixels. Return False if the frame was
+        dropped because the queue was full.
+        """
+        index = self.captured
+        self.captured += 1
+
+        if self._thread is None:
+            self._start(surface.get_size())
+
+        # Checked first so a dropped frame costs no copy
+        if self._queue.full():
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait(
+                (index, pygame.image.tostring(surface, 'RGB'))
+            )
+        except Full:
+            self.dropped += 1
+            return False
+
+        return True
+
+    def close(self):
+        """Write out all queued frames, then stop the writer thread."""
+        if self._thread is None:
+            return
+
+        # If the writer died (e.g. encoder not found), nothing will empty
+        # the queue, so stop waiting for room once it is gone
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except Full:
+                pass
+        self._thread.join()
+        self._thread = None
+
+        w, h = self._size
+        with open(os.path.join(self.path, 'frames.json'), 'w') as f:
+            json.dump({
+                'format' : self.fmt,
+                'width' : w,
+                'height' : h,
+                'pixel_format' : 'rgb24',
+                'fps' : self.fps,
+                'captured' : self.captured,
+                'written' : self.captured - self.dropped,
+                'dropped' : self.dropped,
+            }, f, indent=2)
+
+    def _start(self, size):
+        w, h = size
+        self._size = size
+        self._queue = Queue(max(self._max_bytes // (w*h*3), 1))
+        # A daemon, so the process can still exit if close() is never called
+        self._thread = threading.Thread(target=self._write,
+            name='FrameRecorder', daemon=True
+        )
+        self._thread.start()
+
+    def _write(self):
+        """Writer thread: encode frames until None is received."""
+        w, h = self._size
+        proc = out = None
+
+        if self.fmt == 'raw':
+            out = open(os.path.join(self.path, 'frames.rgb'), 'wb')
+        elif self.fmt == 'pipe':
+            proc = subprocess.Popen(shlex.split(self._command.format(
+                w=w, h=h, fps=self.fps, dir=shlex.quote(self.path)
+            )), stdin=subprocess.PIPE)
+            out = proc.stdin
+
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+
+                index, data = frame
+                if out is not None:
+                    out.write(data)
+                else:
+                    pygame.image.save(
+                        pygame.image.frombuffer(data, self._size, 'RGB'),
+                        os.path.join(self.path,
+                            'frame_{:06d}.png'.format(index)
+                        )
+                    )
+        finally:
+            if out is not None:
+                out.close()
+            if proc is not None:
+                proc.wait()
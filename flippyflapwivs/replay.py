@@ -0,0 +1,265 @@
+"""
+replay.py
+Author: Adam Beagle
+
+PURPOSE:
+  Recording and deterministic replay of game input.
+
+  An InputLog holds everything needed to reproduce a session exactly: the
+  seed of the column RNG, the GameState reset delay, the tile size of the
+  game's geometry, the dt of every simulation tick (run-length
+  encoded, as it is normally constant) and the tick index of each input
+  that changed the game state. The game subpackage has no other source of
+  nondeterminism, so replay() reproduces a session tick for tick at any
+  speed, with or without a ui.
+
+  The final score and player y of the recorded session are stored with the
+  log, so a replay can be checked against the original.
+
+FILE FORMAT (little-endian):
+  header  - magic b'FFWI', version (B), collision flag (B), seed (Q),
+            reset delay (d), tile w (d), tile h (d), result flag (B),
+            result score (I), result player y (d), number of dt runs (I),
+            number of events (I)
+  dt runs - count (I), dt (d) for each run
+  events  - tick index (I) of each event, then action (B) of each event
+
+  Version 1 logs, which have no reset delay, are loaded with a delay of 0.
+  Version 1 and 2 logs, which have no tile size, are loaded with
+  game.gamedata.Game.TILE, the geometry they were recorded with.
+
+CONTENTS:
+  InputLog
+  replay
+  report
+"""
+from array import array
+import struct
+import sys
+from time import perf_counter
+
+import pygame
+
+from game.gamedata import Game
+
+class InputLog:
+    """
+    Input of one game session. See module docstring.
+
+    ATTRIBUTES:
+      FLAP, COLLISION - Actions; each sets the game state of the same name
+      collision       - collision argument of the recorded GameData. If
+                        False, collisions detected by the ui are recorded as
+                        COLLISION events.
+      dt_runs         - List of [count, dt] of simulation ticks
+      reset_delay     - reset_delay of the recorded GameState
+      result          - (score, player y) at the end of the session, or None
+      seed            - Seed of the recorded GameData
+      tile            - tile of the recorded GameData
+      ticks, actions  - Tick index and action of each event, in order
+
+    METHODS:
+      finish
+      load (classmethod)
+      record_collision
+      record_input
+      save
+    """
+    FLAP = 1
+    COLLISION = 2
+    MAGIC = b'FFWI'
+    VERSION = 3
+    _HEADER = struct.Struct('<4sBBQdddBIdII')
+    _HEADER_V2 = struct.Struct('<4sBBQdBIdII')
+    _HEADER_V1 = struct.Struct('<4sBBQBIdII')
+    _RUN = struct.Struct('<Id')
+
+    def __init__(self, seed, collision=True, reset_delay=0, tile=Game.TILE):
+        self.seed = seed
+        self.collision = collision
+        self.reset_delay = reset_delay
+        self.tile = tuple(tile)
+        self.dt_runs = []
+        self.result = None
+        self.ticks = array('I')
+        self.actions = array('B')
+        self._n_ticks = 0
+
+    def __len__(self):
+        """Return number of ticks recorded."""
+        return self._n_ticks
+
+    def finish(self, gamedata):
+        """Store the result of the session. Call once recording ends."""
+        self.result = (gamedata.score, gamedata.player_position[1])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version = struct.unpack_from('<4sB', data)
+        if magic != cls.MAGIC or version not in range(1, cls.VERSION + 1):
+            raise ValueError('{} is not a version 1-{} input log'.format(
+                path, cls.VERSION
+            ))
+
+        if version == 1:
+            header = cls._HEADER_V1
+            (magic, version, collision, seed, has_result, score, y, n_runs,
+                n_events) = header.unpack_from(data)
+            reset_delay = 0
+            tile = Game.TILE
+        elif version == 2:
+            header = cls._HEADER_V2
+            (magic, version, collision, seed, reset_delay, has_result, score,
+                y, n_runs, n_events) = header.unpack_from(data)
+            tile = Game.TILE
+        else:
+            header = cls._HEADER
+            (magic, version, collision, seed, reset_delay, tile_w, tile_h,
+                has_result, score, y, n_runs, n_events
+            ) = header.unpack_from(data)
+            tile = (tile_w, tile_h)
+
+        log = cls(seed, bool(collision), reset_delay, tile)
+        if has_result:
+            log.result = (score, y)
+
+        offset = header.size
+        for i in range(n_runs):
+            count, dt = cls._RUN.unpack_from(data, offset)
+            log.dt_runs.append([count, dt])
+            log._n_ticks += count
+            offset += cls._RUN.size
+
+        log.ticks.frombytes(data[offset:offset + 4*n_events])
+        log.actions.frombytes(data[offset + 4*n_events:])
+        if sys.byteorder == 'big':
+            log.ticks.byteswap()
+
+        return log
+
+    def record_collision(self, gamestate):
+        """
+        Call after the ui is updated in each tick, so collisions the ui
+        detected are recorded when GameData does not detect them itself.
+        """
+        gs = gamestate
+        if not self.collision and gs.state == gs.COLLISION:
+            self._add(self._n_ticks - 1, self.COLLISION)
+
+    def record_input(self, gamestate, dt):
+        """
+        Call at the start of each tick, after input has been handled and
+        before GameData.update().
+        """
+        gs = gamestate
+        if gs.state == gs.FLAP:
+            self._add(self._n_ticks, self.FLAP)
+
+        if self.dt_runs and self.dt_runs[-1][1] == dt:
+            self.dt_runs[-1][0] += 1
+        else:
+            self.dt_runs.append([1, dt])
+        self._n_ticks += 1
+
+    def save(self, path):
+        score, y = self.result or (0, 0)
+        ticks = array('I', self.ticks)
+        if sys.byteorder == 'big':
+            ticks.byteswap()
+
+        with open(path, 'wb') as f:
+            f.write(self._HEADER.pack(self.MAGIC, self.VERSION,
+                self.collision, self.seed, self.reset_delay, *self.tile,
+                self.result is not None, score, y, len(self.dt_runs),
+                len(self.ticks)
+            ))
+            for count, dt in self.dt_runs:
+                f.write(self._RUN.pack(count, dt))
+            f.write(ticks.tobytes())
+            f.write(self.actions.tobytes())
+
+    def _add(self, tick, action):
+        self.ticks.append(tick)
+        self.actions.append(action)
+
+def replay(log, gamestate, gamedata, uimanager=None):
+    """
+    Run the ticks of log as fast as possible. gamestate must be new and
+    created with log.reset_delay, and gamedata new and created with
+    log.seed, log.collision and log.tile.
+
+    If uimanager is given, it is updated and drawn each tick and the replay
+    stops early on a pygame QUIT event. Its level must have been created
+    with the scroll speed of the log's dt.
+
+    Return a dict of the statistics of headless.run(), plus 'result', the
+    (score, player y) reached, and 'match', whether it equals log.result
+    (None if the log has no result).
+    """
+    gs = gamestate
+    gd = gamedata
+    uim = uimanager
+    events = zip(log.ticks, log.actions)
+    event_tick, action = next(events, (None, None))
+    tick = 0
+    games = 0
+    best = 0
+
+    start = perf_counter()
+    for dt in (dt for count, dt in log.dt_runs for i in range(count)):
+        gs.transition_state()
+
+        if event_tick == tick and action == log.FLAP:
+            if gs.in_group(gs.FLAPPABLE):
+                gs.state = gs.FLAP
+            event_tick, action = next(events, (None, None))
+
+        gd.update(gs, dt)
+        if uim is not None:
+            uim.update(gs, gd, 1)
+
+        if event_tick == tick and action == log.COLLISION:
+            gs.state = gs.COLLISION
+            event_tick, action = next(events, (None, None))
+
+        gd.postupdate(gs, dt)
+        tick += 1
+
+        if gs.state == gs.RESET:
+            games += 1
+        elif gd.score > best:
+            best = gd.score
+
+        if uim is not None:
+            uim.draw()
+            if pygame.event.peek(pygame.QUIT):
+                break
+    elapsed = perf_counter() - start
+
+    result = (gd.score, gd.player_position[1])
+    return {
+        'frames' : tick,
+        'seconds' : elapsed,
+        'fps' : tick / elapsed if elapsed else float('inf'),
+        'games' : games,
+        'best_score' : best,
+        'result' : result,
+        'match' : None if log.result is None else result == log.result,
+    }
+
+def report(path, stats):
+    """Print one line of statistics returned by replay() for log at path."""
+    if stats['match'] is None:
+        check = 'no recorded result'
+    elif stats['match']:
+        check = 'OK'
+    else:
+        check = 'MISMATCH'
+
+    print(
+        '{}: {frames} ticks in {seconds:.3f}s ({fps:.0f} ticks/s), '
+        'score {}, {}'.format(path, stats['result'][0], check, **stats)
+    )
@@ -0,0 +1,47 @@
+"""
+scheduler.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains FrameSkipper, which decides each frame whether the game loop
+  should draw. Simulation steps are never skipped; when rendering cannot
+  keep to the frame budget, drawing is skipped instead so the simulation
+  can keep up with real time.
+"""
+
+class FrameSkipper:
+    """
+    Skips drawing while frames run over budget, for at most max_skip
+    frames in a row. A frame is over budget if it took longer than OVERRUN
+    times 1/fps; the margin allows for the limited resolution of the frame
+    clock.
+
+    ATTRIBUTES:
+      OVERRUN  - See above
+      budget   - Seconds per frame
+      max_skip - Max consecutive frames not drawn (0 disables skipping)
+      run      - Number of frames skipped in a row so far
+
+    METHODS:
+      should_draw
+    """
+    OVERRUN = 1.25
+
+    def __init__(self, fps, max_skip):
+        self.budget = 1 / fps
+        self.max_skip = max_skip
+        self.run = 0
+
+    def should_draw(self, frame_time):
+        """
+        Return False if the current frame should not be drawn, given the
+        real time in seconds the previous frame took.
+        """
+        if (frame_time > self.OVERRUN*self.budget and
+            self.run < self.max_skip
+        ):
+            self.run += 1
+            return False
+
+        self.run = 0
+        return True
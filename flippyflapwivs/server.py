@@ -0,0 +1,309 @@
+"""
+server.py
+Author: Adam Beagle
+
+PURPOSE:
+  Serves headless games to remote clients (e.g. bots) over TCP or a Unix
+  socket. Every connection gets its own session, a GameData and GameState,
+  and all sessions share one asyncio event loop. A single tick task steps
+  every session once per tick, at a fixed tick rate, then streams each its
+  new state; connections only queue commands for the next tick.
+
+  The protocol is JSON lines. On connecting, a client is sent
+    {"session": id, "seed": seed, "tick_rate": rate}
+  then, after each tick,
+    {"frame": n, "state": name, "score": s, "high_score": h,
+     "observation": [player y, player dy, column dx, column gap]}
+  where state is a name of game.states.NAMES and observation is that of
+  GameData.observation. A client may send, one per line:
+    {"cmd": "flap"}  - Flap on the next tick
+    {"cmd": "reset"} - Reset the game on the next tick
+    {"cmd": "quit"}  - Close the session
+  Anything else is answered with {"error": message}.
+
+  Games restart by themselves after a collision, like the game's. A state
+  line is dropped (and counted) rather than queued if a client has not
+  read enough of its earlier ones, so a slow client never stalls the tick.
+
+USAGE:
+  python server.py [--port P | --unix PATH] [--tick-rate R] [--seed S]
+  Run with -h for all options.
+
+    server = GameServer(tick_rate=60, seed=0)
+    await server.start_tcp('127.0.0.1', 7777)
+    await server.run()
+"""
+from argparse import ArgumentParser
+import asyncio
+import json
+import random
+
+from game import GameData, GameState
+from game.states import NAMES
+import headless
+
+class Session:
+    """
+    One client's game.
+
+    ATTRIBUTES:
+      id
+      seed      - Seed of the game's column openings
+      gamestate
+      gamedata
+      frame     - Number of ticks stepped
+      dropped   - Number of state lines dropped for a slow client
+      flap      - If set, flap on the next tick
+      reset     - If set, reset on the next tick
+
+    METHODS:
+      close
+      send
+      state
+      step
+    """
+    def __init__(self, id, seed, writer, reset_delay=0):
+        self.id = id
+        self.seed = seed
+        self.gamestate = GameState(reset_delay)
+        self.gamedata = GameData(0, seed)
+        self.frame = 0
+        self.dropped = 0
+        self.flap = False
+        self.reset = False
+        self._writer = writer
+        self._observation = [0.0]*4
+
+    def close(self):
+        self._writer.close()
+
+    def send(self, message, limit=None):
+        """
+        Write message as a JSON line. Return False, and count it as
+        dropped, if the client's unsent output exceeds limit bytes.
+        """
+        transport = self._writer.transport
+        if transport.is_closing():
+            return False
+        if limit is not None and transport.get_write_buffer_size() > limit:
+            self.dropped += 1
+            return False
+
+        self._writer.write(
+            json.dumps(message, separators=(',', ':')).encode() + b'\n'
+        )
+        return True
+
+    def state(self):
+        """Return the message streamed after each tick."""
+        gd = self.gamedata
+        return {
+            'frame' : self.frame,
+            'state' : NAMES[self.gamestate.state],
+            'score' : gd.score,
+            'high_score' : gd.high_score,
+            'observation' : gd.observe(self._observation),
+        }
+
+    def step(self, dt):
+        """Advance one frame, applying the commands queued since the last."""
+        gs = self.gamestate
+        if self.reset:
+            # As in FlapEnv.reset(): a RESET frame resets the game, and
+            # transitions to WAIT_FIRST_FLAP at the start of the next
+            gs.state = gs.RESET
+            self.gamedata.update(gs, dt)
+            self.gamedata.postupdate(gs, dt)
+        else:
+            headless.step(gs, self.gamedata, self.flap, dt)
+
+        self.flap = self.reset = False
+        self.frame += 1
+
+class GameServer:
+    """
+    Hosts any number of Sessions, stepped together once per tick by run().
+
+    Ticks are scheduled at fixed times, so a late tick is followed by the
+    next one at once to catch up, but by at most MAX_LAG ticks: beyond
+    that the schedule restarts from the current time and the missed ticks
+    are counted as late.
+
+    ATTRIBUTES:
+      MAX_LAG      - See above
+      WRITE_LIMIT  - Unsent bytes above which a client's state is dropped
+      tick_rate    - Ticks per second
+      sessions     - Dict of session id to Session
+      ticks        - Number of ticks run
+      late         - Number of ticks given up on by falling behind
+
+    METHODS:
+      close
+      run
+      start_tcp
+      start_unix
+      tick
+    """
+    MAX_LAG = 5
+    WRITE_LIMIT = 64*1024
+
+    def __init__(self, tick_rate=60, seed=None, reset_delay=0):
+        """
+        seed seeds the seeds of the sessions' games, in order of
+        connection. reset_delay is that of each session's GameState.
+        """
+        self.tick_rate = tick_rate
+        self.sessions = {}
+        self.ticks = 0
+        self.late = 0
+        self._dt = 60 / tick_rate # Game dt, in frames at 60fps
+        self._reset_delay = reset_delay
+        self._rng = random.Random(seed)
+        self._next_id = 0
+        self._servers = []
+        self._handlers = set() # Tasks of _serve()
+
+    async def close(self):
+        """Stop accepting connections and close every session."""
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+        for session in list(self.sessions.values()):
+            session.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    async def run(self, ticks=None):
+        """Run the tick loop, forever or for ticks ticks."""
+        loop = asyncio.get_running_loop()
+        period = 1 / self.tick_rate
+        deadline = loop.time()
+
+        while ticks is None or ticks > 0:
+            self.tick()
+            if ticks is not None:
+                ticks -= 1
+
+            deadline += period
+            lag = loop.time() - deadline
+            if lag > self.MAX_LAG*period:
+                self.late += int(lag / period)
+                deadline = loop.time()
+
+            await asyncio.sleep(max(0, deadline - loop.time()))
+
+    async def start_tcp(self, host='127.0.0.1', port=0):
+        """Accept clients on host:port. Return the bound (host, port)."""
+        server = await asyncio.start_server(self._serve, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[:2]
+
+    async def start_unix(self, path):
+        """Accept clients on the Unix socket at path."""
+        self._servers.append(
+            await asyncio.start_unix_server(self._serve, path)
+        )
+
+    def tick(self):
+        """Step every session one frame, then send each its state."""
+        sessions = list(self.sessions.values())
+        for session in sessions:
+            session.step(self._dt)
+
+        for session in sessions:
+            session.send(session.state(), self.WRITE_LIMIT)
+
+        self.ticks += 1
+
+    async def _serve(self, reader, writer):
+        """Connection handler: queue the client's commands until it quits."""
+        session = Session(self._next_id, self._rng.getrandbits(64), writer,
+            self._reset_delay
+        )
+        self._next_id += 1
+        self.sessions[session.id] = session
+        self._handlers.add(asyncio.current_task())
+        session.send({
+            'session' : session.id,
+            'seed' : session.seed,
+            'tick_rate' : self.tick_rate,
+        })
+
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                if not self._command(session, line):
+                    break
+        except (ConnectionError, ValueError):
+            # ValueError: a line over the stream's limit
+            pass
+        finally:
+            self.sessions.pop(session.id, None)
+            self._handlers.discard(asyncio.current_task())
+            session.close()
+
+    def _command(self, session, line):
+        """Apply the command in line. Return False if the client quit."""
+        try:
+            cmd = json.loads(line)['cmd']
+        except (ValueError, TypeError, KeyError):
+            session.send({'error' : 'Expected {"cmd": ...}'})
+            return True
+
+        if cmd == 'flap':
+            session.flap = True
+        elif cmd == 'reset':
+            session.reset = True
+        elif cmd == 'quit':
+            return False
+        else:
+            session.send({'error' : 'Unknown cmd {!r}'.format(cmd)})
+
+        return True
+
+async def serve(args):
+    server = GameServer(args.tick_rate, args.seed)
+    if args.unix is not None:
+        await server.start_unix(args.unix)
+        print('Serving on {}'.format(args.unix))
+    else:
+        host, port = await server.start_tcp(args.host, args.port)
+        print('Serving on {}:{}'.format(host, port))
+
+    try:
+        await server.run()
+    finally:
+        await server.close()
+
+def main():
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Serve headless FlippyFlap Wivs games over a socket.'
+    )
+    parser.add_argument('--host', default='127.0.0.1',
+        help='TCP host to listen on (default 127.0.0.1)'
+    )
+    parser.add_argument('--port', type=int, default=7777, metavar='int',
+        help='TCP port to listen on (default 7777)'
+    )
+    parser.add_argument('--unix', metavar='PATH',
+        help='Listen on a Unix socket at PATH instead of TCP'
+    )
+    parser.add_argument('--tick-rate', type=int, default=60, metavar='int',
+        help='Ticks per second (default 60)'
+    )
+    parser.add_argument('--seed', type=int, metavar='int',
+        help='Seed of all sessions\' games (default is random)'
+    )
+    return parser.parse_args()
+
+###############################################################################
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+# Tests import the package's modules as main.py does, from its directory
+import sys
+from os import path
+
+sys.path.insert(0,
+    path.abspath(path.join(path.dirname(__file__), path.pardir))
+)
@@ -0,0 +1,36 @@
+"""Event-driven headless runs, which skip frames, against stepped runs."""
+import random
+
+import pytest
+
+from game import GameData, GameState
+import headless
+
+FRAMES = 50000
+
+@pytest.mark.parametrize('dt', (0.5, 1, 2))
+@pytest.mark.parametrize('reset_delay', (0, 1.0))
+@pytest.mark.parametrize('seed', (0, 24))
+def test_event_driven_matches_stepped(seed, reset_delay, dt):
+    rng = random.Random(seed)
+    inputs = headless.ScriptedInput(rng.sample(range(FRAMES), FRAMES//25))
+
+    results = []
+    for event_driven in (False, True):
+        gs = GameState(reset_delay)
+        gd = GameData(0, seed)
+        stats = headless.run(gs, gd, inputs, FRAMES, dt,
+            event_driven=event_driven
+        )
+        results.append((stats, gs, gd.freeze()))
+
+    (stepped, gs, a), (skipped, gs_skipped, b) = results
+    assert skipped['games'] == stepped['games']
+    assert skipped['best_score'] == stepped['best_score']
+    assert gs_skipped.state == gs.state
+    assert gs_skipped.timer == pytest.approx(gs.timer, abs=1e-9)
+    assert b.score == a.score
+    assert b.player_y == pytest.approx(a.player_y, abs=1e-9)
+    assert b.player_dy == pytest.approx(a.player_dy, abs=1e-9)
+    assert list(b.column_x) == pytest.approx(list(a.column_x), abs=1e-9)
+    assert b.column_gap == a.column_gap
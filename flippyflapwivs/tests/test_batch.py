@@ -0,0 +1,41 @@
+"""BatchGame against the scalar Game it vectorizes."""
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from game import GameData, GameState
+from game.batch import BatchGame
+import headless
+
+FRAMES = 3000
+
+@pytest.mark.parametrize('seed', range(20))
+def test_batch_matches_game(seed):
+    gs = GameState()
+    gd = GameData(0, seed)
+    game = gd._game
+    bg = BatchGame(1, seed=seed)
+    bg.column_gap[0] = game.column_gap
+
+    # Autopilot, to score, with random flaps, to die now and then
+    autopilot = headless.AutopilotInput()
+    rng = random.Random(seed)
+    for frame in range(FRAMES):
+        flap = (gs.state == gs.WAIT_FIRST_FLAP or rng.random() < 0.01 or
+            autopilot(gd.observation)
+        )
+        headless.step(gs, gd, flap)
+        bg.step(flap)
+
+        assert bg.state[0] == gs.state, frame
+        assert bg.player_y[0] == pytest.approx(game.player.y, abs=1e-9)
+        assert bg.player_dy[0] == pytest.approx(game.player.dy, abs=1e-9)
+        assert bg.score[0] == game.player.score
+        assert bg.high_score[0] == game.high_score
+        assert list(bg.column_x[0]) == pytest.approx(list(game.column_x))
+
+        # Openings are drawn from different RNGs. A column only takes a new
+        # one offscreen, at x = 1, so syncing after each frame is exact.
+        bg.column_gap[0] = game.column_gap
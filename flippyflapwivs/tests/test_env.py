@@ -0,0 +1,27 @@
+"""FlapEnv episodes and the ui drawing them."""
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pygame')
+
+from env import FlapEnv
+import headless
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pixel_env_draws_onscreen_columns(seed):
+    env = FlapEnv('pixels', seed=seed, max_frames=2000)
+    policy = headless.AutopilotInput()
+    gd = env._gd
+    columns = env.uimanager.level.columns
+
+    try:
+        env.reset()
+        done = False
+        while not done:
+            for i, x in enumerate(gd.column_x):
+                if x < 1:
+                    assert columns[i].alive(), (env._frames, i, x)
+
+            obs, reward, done, info = env.step(policy(gd.observation))
+    finally:
+        env.close()
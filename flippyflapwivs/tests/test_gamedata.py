@@ -0,0 +1,41 @@
+"""Game snapshots and the column openings they restore."""
+import random
+
+import pytest
+
+from game import GameData, GameState
+from game.gamedata import Game
+import headless
+
+def play(gs, gd, frames, seed):
+    """Return the frozen state after each of frames frames of play."""
+    autopilot = headless.AutopilotInput()
+    rng = random.Random(seed)
+    states = []
+    for frame in range(frames):
+        headless.step(gs, gd, rng.random() < 0.01 or autopilot(gd.observation))
+        states.append((gs.state, gd.freeze()))
+
+    return states
+
+@pytest.mark.parametrize('gaps_kept', (Game.GAPS_KEPT, 8))
+@pytest.mark.parametrize('seed', (0, 1, None))
+def test_snapshot_restore(monkeypatch, seed, gaps_kept):
+    # A small GAPS_KEPT drops openings, which restore() must draw again
+    monkeypatch.setattr(Game, 'GAPS_KEPT', gaps_kept)
+    gs = GameState()
+    gd = GameData(0, seed)
+    play(gs, gd, 1000, 0)
+    snapshot = gd.snapshot(gs)
+    expected = play(gs, gd, 5000, 1)
+
+    # Branch again from the snapshot on the same game...
+    gd.restore(gs, snapshot)
+    assert play(gs, gd, 5000, 1) == expected
+
+    # ...and on a new game with the same seed
+    if seed is not None:
+        gs = GameState()
+        gd = GameData(0, seed)
+        gd.restore(gs, snapshot)
+        assert play(gs, gd, 5000, 1) == expected
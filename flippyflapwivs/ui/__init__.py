@@ -4,3 +4,4 @@ platformer.ui
 This subpackage contains all presentation logic for the game.
 """
 from .manager import UIManager
+from .util import game_tile_size
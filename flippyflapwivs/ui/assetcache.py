@@ -0,0 +1,180 @@
+"""
+assetcache.py
+Author: Adam Beagle
+
+PURPOSE:
+  Contains AssetCache, an on-disk cache of converted surfaces and their
+  collision masks. Cached surfaces are stored as raw pixel bytes in the
+  display's own layout and loaded back with pygame.image.frombuffer, so no
+  image decoding, conversion, flipping or mask building is needed at
+  startup once the cache is warm.
+
+USAGE:
+  The cache file is only valid for a single key, which should identify
+  everything the cached data depends on (e.g. source file hash and display
+  pixel format). A cache file with a different key or version is ignored
+  and overwritten on save().
+
+  A whole file is read on creation and written on save(), so keep each
+  file to the assets one launch needs (e.g. one file per resolution).
+
+    cache = AssetCache(path, key)
+    sfc = cache.get_surface('name')
+    if sfc is None:
+        sfc = expensive_render()
+        cache.put_surface('name', sfc)
+    cache.save()
+"""
+import os
+import pickle
+
+import pygame
+
+# frombuffer/tostring format for each (R, G, B, A) mask layout of
+# a little-endian 32-bit surface
+_BUFFER_FORMATS = {
+    (0xff0000, 0xff00, 0xff, 0xff000000) : 'BGRA',
+    (0xff, 0xff00, 0xff0000, 0xff000000) : 'RGBA',
+    (0xff00, 0xff0000, 0xff000000, 0xff) : 'ARGB',
+}
+
+class AssetCache:
+    """
+    On-disk cache of surfaces and masks, keyed by name.
+
+    ATTRIBUTES:
+      VERSION - Incremented when the file layout or contents change
+      format  - Pixel layout used for surface bytes
+
+    METHODS:
+      get_mask
+      get_surface
+      put_mask
+      put_surface
+      save
+    """
+    VERSION = 2
+
+    def __init__(self, path, key):
+        """
+        key must be picklable and comparable. The display must be
+        initialized, as the pixel format of convert_alpha() is used.
+        """
+        self.path = path
+        self.format = buffer_format()
+        self._key = (self.VERSION, self.format, key)
+        self._surfaces = {}
+        self._masks = {}
+        self._changed = False
+        self._load()
+
+    def get_mask(self, name):
+        """Return cached mask, or None."""
+        try:
+            size, rects = self._masks[name]
+        except KeyError:
+            return None
+
+        mask = pygame.mask.Mask(size)
+        for x, y, w, h in rects:
+            mask.draw(pygame.mask.Mask((w, h), fill=True), (x, y))
+
+        return mask
+
+    def get_surface(self, name):
+        """Return cached surface, or None. Surface shares the cached bytes."""
+        try:
+            size, data = self._surfaces[name]
+        except KeyError:
+            return None
+
+        return pygame.image.frombuffer(data, size, self.format)
+
+    def put_mask(self, name, mask):
+        self._masks[name] = (mask.get_size(), _mask_to_rects(mask))
+        self._changed = True
+
+    def put_surface(self, name, surface):
+        self._surfaces[name] = (
+            surface.get_size(), pygame.image.tostring(surface, self.format)
+        )
+        self._changed = True
+
+    def save(self):
+        """
+        Write cache to disk if anything was added since it was loaded.
+        Failure to write (e.g. read-only install) is not an error.
+        """
+        if not self._changed:
+            return
+
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump((self._key, self._surfaces, self._masks), f,
+                    pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp, self.path)
+        except OSError:
+            return
+
+        self._changed = False
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                key, surfaces, masks = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+
+        if key == self._key:
+            self._surfaces = surfaces
+            self._masks = masks
+
+def buffer_format():
+    """
+    Return the frombuffer/tostring format string matching the layout of
+    convert_alpha() surfaces on the current display, or 'RGBA' if none
+    matches exactly.
+    """
+    sfc = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+    return _BUFFER_FORMATS.get(tuple(sfc.get_masks()), 'RGBA')
+
+def _mask_to_rects(mask):
+    """
+    Return list of (x, y, w, h) rects covering exactly the set bits of mask.
+    Rows with identical runs of set bits are merged, so large solid areas
+    need only a few rects.
+    """
+    w, h = mask.get_size()
+    alpha = pygame.image.tostring(
+        mask.to_surface(setcolor=(255, 255, 255, 255),
+            unsetcolor=(0, 0, 0, 0)
+        ), 'RGBA'
+    )[3::4]
+
+    rects = []
+    block_runs, block_top = (), 0
+    for y in range(h + 1):
+        runs = _row_runs(alpha[y*w:(y + 1)*w]) if y < h else ()
+        if runs != block_runs:
+            rects.extend(
+                (x0, block_top, x1 - x0, y - block_top)
+                for x0, x1 in block_runs
+            )
+            block_runs, block_top = runs, y
+
+    return rects
+
+def _row_runs(row):
+    """Return tuple of (start, stop) of each run of nonzero bytes in row."""
+    runs = []
+    x = row.find(b'\xff')
+    while x != -1:
+        stop = row.find(b'\x00', x)
+        if stop == -1:
+            stop = len(row)
+        runs.append((x, stop))
+        x = row.find(b'\xff', stop)
+
+    return tuple(runs)
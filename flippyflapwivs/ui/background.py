@@ -8,19 +8,24 @@ PURPOSE:
 """
 import pygame
 
+from game.states import ALL, WAIT_RESET, mask
 from .sprites import Cloud
 
 class Background:
     """
     Base class for backgrounds. Subclasses should add sprites with
-    self-contained update() behavior to a `sprites` attribute.
+    self-contained update() behavior to a `sprites` attribute, and also
+    add them to any groups passed to __init__.
+
+    Not updated in WAIT_RESET.
     """
+    STATES = ALL & ~mask(WAIT_RESET)
+
     def __init__(self, fill_color):
         self.fill_color = fill_color
         
     def update(self, gamestate, gamedata, dt):
-        if gamestate.state != gamestate.WAIT_RESET:
-            self.sprites.update(gamestate, gamedata, dt)
+        self.sprites.update(gamestate, gamedata, dt)
 
     def draw(self, sfc):
         sfc.fill(self.fill_color)
@@ -28,8 +33,8 @@ class Background:
 
 class BlueSkyBackground(Background):
     """Simple background with solid blue sky and moving clouds."""
-    def __init__(self):
+    def __init__(self, *groups, config=None):
         super().__init__((135, 206, 235))
         self.sprites = pygame.sprite.Group(
-            Cloud(), Cloud(), Cloud(), Cloud(), Cloud(), Cloud(),
+            *(Cloud(*groups, config=config) for i in range(6))
         )
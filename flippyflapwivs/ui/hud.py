@@ -0,0 +1,80 @@
+"""
+hud.py
+Author: Adam Beagle
+
+PURPOSE:
+  Implements TimingHUD, a toggleable overlay of frame timing percentiles
+  from a profiler.FrameTimer.
+"""
+from time import perf_counter
+
+import pygame
+
+class TimingHUD(pygame.sprite.DirtySprite):
+    """
+    Overlay showing p50/p95/p99 (ms) of each phase timed by a FrameTimer,
+    plus its counters. Hidden until toggle() is called. The text is
+    re-rendered at most every REFRESH seconds.
+    """
+    _layer = 4
+    BG_COLOR = (0, 0, 0, 160)
+    FG_COLOR = (255, 255, 255)
+    FONT_SIZE = 20
+    NAME_W = 130 # Column widths in px
+    NUMBER_W = 56
+    REFRESH = 0.25
+
+    def __init__(self, timer, *groups):
+        super().__init__(*groups)
+        if not pygame.font.get_init():
+            pygame.font.init()
+
+        self.timer = timer
+        self.font = pygame.font.Font(None, self.FONT_SIZE)
+        self.image = pygame.Surface((0, 0))
+        self.rect = pygame.Rect(4, 4, 0, 0)
+        self.visible = 0
+        self._last_refresh = 0
+
+    def draw(self, sfc):
+        if self.visible:
+            sfc.blit(self.image, self.rect)
+
+    def toggle(self):
+        self.visible = 0 if self.visible else 1
+        self.dirty = 1
+
+    def update(self, *args):
+        now = perf_counter()
+        if self.visible and now - self._last_refresh >= self.REFRESH:
+            self._last_refresh = now
+            self._redraw()
+
+    def _redraw(self):
+        rows = [('ms', 'p50', 'p95', 'p99')]
+        for name, stats in self.timer.summary().items():
+            rows.append((name,) + tuple(
+                '{:.2f}'.format(stats[k]) for k in ('p50', 'p95', 'p99')
+            ))
+        for name, n in self.timer.counters.items():
+            rows.append((name, str(n)))
+
+        lh = self.font.get_linesize()
+        w = self.NAME_W + 3*self.NUMBER_W + 8
+        self.image = pygame.Surface((w, lh*len(rows) + 8), pygame.SRCALPHA)
+        self.image.fill(self.BG_COLOR)
+
+        # Name left-aligned, numbers right-aligned in fixed-width columns
+        for i, row in enumerate(rows):
+            y = 4 + i*lh
+            self.image.blit(self._render(row[0]), (4, y))
+            for j, cell in enumerate(row[1:]):
+                text = self._render(cell)
+                right = 4 + self.NAME_W + (j + 1)*self.NUMBER_W
+                self.image.blit(text, (right - text.get_width(), y))
+
+        self.rect.size = self.image.get_size()
+        self.dirty = 1
+
+    def _render(self, text):
+        return self.font.render(text, True, self.FG_COLOR)
@@ -4,64 +4,173 @@ Author: Adam Beagle
 """
 import pygame
 
+from flippyflapwivs import CONFIG
 from .util import BaseSurface, game_coords_to_ui
-from .sprites import Ground, Column
+from .sprites import Column, ColumnPool, Ground
+from .tileset import TILESET
 
 class Level(BaseSurface):
     """
     Wrapper object for level sprites, i.e. ground and columns.
     UiManager should call update() and draw() on every frame.
+
+    All level sprites are also added to any groups passed to __init__.
+
+    Column sprites are created once and reused; their images come from a
+    ColumnPool so spawning a column does not render anything.
+
+    Laid out for config, default CONFIG.
     """
-    def __init__(self, n_columns, scroll_speed):
+    def __init__(self, n_columns, scroll_speed, gaps, *groups, config=None):
+        self.config = CONFIG if config is None else config
         self.sprites = pygame.sprite.Group()
+        self._groups = groups
         self._speed = scroll_speed
-        self.columns = [None]*n_columns
-        self._reset_columns()
+        self._pool = ColumnPool(gaps, config=self.config)
+        self.columns = [Column(config=self.config) for i in range(n_columns)]
 
-        Ground(scroll_speed, self.sprites)
+        Ground(scroll_speed, self.sprites, *groups, config=self.config)
 
     def update(self, gamestate, gamedata, dt):
         gs = gamestate
 
+        for sprite in self.sprites:
+            sprite.prev_topleft = sprite.rect.topleft
+
         # Don't update if WAIT_RESET (nothing in level should change)
         if gs.state == gs.WAIT_RESET:
             return
         
         self.sprites.update(gs, gamedata, dt)
-        edge = game_coords_to_ui(1)[0]
+        edge = game_coords_to_ui(1, config=self.config)[0]
 
         if gs.state == gamestate.RESET:
             self._reset_columns()
 
-        # Update each column's position based on gamedata.column_positions,
+        # Update each column's position based on gamedata.column_x,
         # or spawn a new column if it has gone offscreen
-        for i, (c, cp) in enumerate(
-            zip(self.columns, gamedata.column_positions)
-        ):
-            x, y = game_coords_to_ui(*cp)
+        for i, (c, cx, gap) in enumerate(zip(
+            self.columns, gamedata.column_x, gamedata.column_gaps
+        )):
+            x = game_coords_to_ui(cx, config=self.config)[0]
 
-            if x < edge and c is not None:
-                c.rect.topleft = (x, y)
+            if x < edge and c.alive():
+                c.rect.topleft = (x, 0)
+                c.dirty = 1
             elif edge <= x <= edge + dt*self._speed:
-                self._spawn_column(i)
+                self._spawn_column(i, gap)
 
     def draw(self, sfc):
         self.sprites.draw(sfc)
 
     def _reset_columns(self):
+        # Columns respawn in update() as they re-enter from the right
         for c in self.columns:
-            if c is not None:
-                c.kill()
-            
-        self.columns = [None]*len(self.columns)
-        self._spawn_column(0)
-
-    def _spawn_column(self, i):
-        old_c = self.columns[i]
-        if old_c is not None:
-            old_c.kill()
-            
-        c = Column(self.sprites)
-        c.rect.x = game_coords_to_ui(1)[0]
-        self.columns[i] = c
+            c.kill()
+
+    def _spawn_column(self, i, gap):
+        c = self.columns[i]
+        c.set_variant(self._pool.get(gap))
+        c.rect.topleft = (game_coords_to_ui(1, config=self.config)[0], 0)
+        c.prev_topleft = None
+
+        if not c.alive():
+            c.add(self.sprites, *self._groups)
+
         return c
+
+class RingLevel(BaseSurface):
+    """
+    Level renderer which is itself a wrap-around offscreen strip holding
+    the ground and columns. Each update, only the slice newly exposed at
+    the right edge is drawn, and draw() shows the visible window with one
+    or two blits, so cost does not grow with the number of columns.
+
+    The strip is indexed by world x (screen x plus distance scrolled)
+    modulo its width. There are no level sprites, so collisions must be
+    detected by the game package.
+
+    If alpha is set, draw() shows the strip that fraction of the way from
+    the previous update's scroll offset to the current one, as moving
+    sprites are interpolated. Nothing in the level changes in WAIT_RESET,
+    so it does not scroll. Laid out for config, default CONFIG.
+    """
+    def __init__(self, n_columns, scroll_speed, gaps, config=None):
+        self.config = CONFIG if config is None else config
+        w, h = self.config.RENDER_SIZE
+        super().__init__((w + 2*TILESET.SIDE, h), flags=pygame.SRCALPHA)
+        self.sprites = pygame.sprite.Group() # Always empty
+        self._speed = scroll_speed
+        self._pool = ColumnPool(gaps, config=self.config)
+        self._ground_img = TILESET.TILES['ground']
+        self.alpha = None
+        self._offset = 0 # World x of left of screen
+        self._prev_offset = 0 # _offset before the last update
+        # Strip is valid for world x in [_drawn - width, _drawn)
+        self._drawn = 0
+
+    def update(self, gamestate, gamedata, dt):
+        gs = gamestate
+        self._prev_offset = self._offset
+        if gs.state == gs.WAIT_RESET:
+            return
+
+        self._offset += dt*self._speed
+        left = int(self._offset)
+
+        if gs.state == gs.RESET:
+            self._drawn = left
+
+        self._draw_slice(gamedata, self._drawn,
+            left + self.config.RENDER_SIZE[0]
+        )
+
+    def draw(self, sfc):
+        w, h = self.config.RENDER_SIZE
+        offset = self._offset
+        if self.alpha is not None:
+            prev = self._prev_offset
+            offset = prev + self.alpha*(offset - prev)
+        x = int(offset) % self.rect.w
+        first = min(w, self.rect.w - x)
+
+        sfc.blit(self, (0, 0), (x, 0, first, h))
+        if first < w:
+            sfc.blit(self, (first, 0), (0, 0, w - first, h))
+
+    def _draw_slice(self, gamedata, start, end):
+        """Draw world x in [start, end) into the strip."""
+        ringw = self.rect.w
+        start = max(start, end - ringw)
+
+        while start < end:
+            # Split where the slice wraps around the strip
+            x = start % ringw
+            stop = min(end, start + ringw - x)
+            self._draw_segment(gamedata, start, stop, x - start)
+            start = stop
+
+        self._drawn = end
+
+    def _draw_segment(self, gamedata, start, end, shift):
+        """
+        Draw world x in [start, end), which must not wrap, into the strip.
+        shift is the difference between strip x and world x.
+        """
+        side = TILESET.SIDE
+        h = self.rect.h
+        self.set_clip((start + shift, 0, end - start, h))
+        self.fill((0, 0, 0, 0))
+
+        for tx in range(start - start%side, end, side):
+            self.blit(self._ground_img, (tx + shift, h - side))
+
+        # Columns not yet scrolled onscreen (x >= 1) are not drawn
+        for x, gap in zip(gamedata.column_x, gamedata.column_gaps):
+            cx = int(round(
+                self._offset + game_coords_to_ui(x, config=self.config)[0]
+            ))
+            if cx < end and start < cx + side and x < 1:
+                self.blit(self._pool.get(gap)[0], (cx + shift, 0))
+
+        self.set_clip(None)
@@ -11,30 +11,39 @@ CONTENTS:
   AudioPlayer
   UIManager
 """
-from adamlib.game.pygame.audio import AudioPlayer as BaseAudioPlayer
 import pygame
 
 from flippyflapwivs import CONFIG
+from game.states import ALL, handler_table
 from .resmaps import SOUNDS
 from .background import BlueSkyBackground
-from .level import Level
+from .hud import TimingHUD
+from .level import Level, RingLevel
 from .player import Wivs
-from .sprites import Score
+from .sprites import HighScore, Score
 from .tileset import TILESET
 from .util import game_coords_to_ui
 
-class AudioPlayer(BaseAudioPlayer):
+class AudioPlayer:
     """
     Handles all audio tasks (instantiating, playing, stopping, etc.)
 
-    Update() should be called once per frame.
+    Music is streamed from disk with pygame.mixer.music rather than decoded
+    into memory, and sound effects are loaded on first play. The mixer
+    itself is initialized on first use, so nothing is loaded while muted.
+
+    Nothing is played if config (default CONFIG) is muted. Update() should
+    be called once per frame.
     """
-    def __init__(self):
-        super().__init__(SOUNDS)
-        self.set_volume('music', 0.5)
-        self.set_volume('collision', 0.5)
+    VOLUMES = {
+        'collision' : 0.5,
+        'music' : 0.5,
+    }
+
+    def __init__(self, config=None):
+        self._sounds = {}
 
-        if not CONFIG.MUTE:
+        if not (CONFIG if config is None else config).MUTE:
             self._start_music()
 
     def update(self, gamestate, *args):
@@ -46,7 +55,6 @@ class AudioPlayer(BaseAudioPlayer):
             self._start_music()
         
         if gs.state == gs.RESET:
-            self.wait_until_sound_end()
             self._start_music()
         elif gs.state == gs.COLLISION:
             self.stop_all()
@@ -54,39 +62,193 @@ class AudioPlayer(BaseAudioPlayer):
         elif gs.state == gs.SCORE:
             self.play('score')
 
+    def length(self, key):
+        """Return length in seconds of sound effect key."""
+        return self._load(key).get_length()
+
+    def play(self, key, loops=0):
+        """Play sound effect key (of resmaps.SOUNDS), loading it if needed."""
+        self._load(key).play(loops=loops)
+
+    def stop_all(self):
+        if pygame.mixer.get_init():
+            pygame.mixer.stop()
+            pygame.mixer.music.stop()
+
+    def _init_mixer(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+
+    def _load(self, key):
+        try:
+            return self._sounds[key]
+        except KeyError:
+            self._init_mixer()
+            sound = self._sounds[key] = pygame.mixer.Sound(SOUNDS[key])
+            sound.set_volume(self.VOLUMES.get(key, 1))
+            return sound
+
     def _start_music(self):
-        self.play('music', loops=-1)
+        self._init_mixer()
+        pygame.mixer.music.load(SOUNDS['music'])
+        pygame.mixer.music.set_volume(self.VOLUMES['music'])
+        pygame.mixer.music.play(loops=-1)
 
 class UIManager:
     """
     Interface from main to the ui modules. Main should call update(),
     then draw() once per frame.
+
+    Options are read from config, a Config passed on to every ui element,
+    which defaults to the global CONFIG; CONFIG below means config.
+
+    If CONFIG.DIRTY_RECTS is set, all sprites are also members of a
+    LayeredDirty group, and draw() redraws and updates only the regions
+    that changed instead of filling and flipping the whole screen.
+
+    If CONFIG.RING_LEVEL is set, the level is drawn by a RingLevel and
+    CONFIG.DIRTY_RECTS is ignored.
+
+    Each element's update() is only called in the states of its STATES
+    group (see game.states), or in all states if it has none.
+
+    Collisions are detected by the game package unless
+    CONFIG.PRECISE_COLLISION is set, in which case update() detects them
+    per-pixel from sprite masks.
+
+    If a profiler.FrameTimer is passed as timer, a TimingHUD of it is drawn
+    on top, toggled by the 'toggle_hud' gamestate kwarg.
+
+    If CONFIG.RENDER_SIZE differs from CONFIG.SCREEN_SIZE, everything is
+    drawn to an offscreen surface of RENDER_SIZE, which is scaled to the
+    display once per frame (see CONFIG.SCALE_MODE), centered with black
+    borders if the aspect ratios differ. Dirty rects then only limit
+    drawing, as the whole display is updated each frame.
+
+    If offscreen, the display is left alone: everything is drawn to an
+    offscreen surface of RENDER_SIZE, which draw() does not show, so any
+    number of UIManagers (of any sizes) can run in one process. Images
+    still need a display mode, so a 1x1 one is set if there is none.
+
+    ATTRIBUTES:
+      MUTED_RESET_DELAY - reset_delay while muted, in seconds
     """
-    def __init__(self, n_columns, scroll_speed):
-        self._screen = pygame.display.set_mode(
-            CONFIG.SCREEN_SIZE,
-            pygame.FULLSCREEN if CONFIG.FULLSCREEN else 0
-        )
+    MUTED_RESET_DELAY = 1
+
+    def __init__(self, n_columns, scroll_speed, gaps, high_score=0,
+        timer=None, config=None, offscreen=False
+    ):
+        self.config = config = CONFIG if config is None else config
+        self.offscreen = offscreen
+
+        if offscreen:
+            if pygame.display.get_surface() is None:
+                pygame.display.set_mode((1, 1))
+            self._display = None
+            self._screen = pygame.Surface(config.RENDER_SIZE).convert()
+            self._scaled = None
+        else:
+            self._display = pygame.display.set_mode(
+                config.SCREEN_SIZE,
+                pygame.FULLSCREEN if config.FULLSCREEN else 0
+            )
+
+            if tuple(config.RENDER_SIZE) != self._display.get_size():
+                self._screen = pygame.Surface(config.RENDER_SIZE).convert()
+                self._display.fill((0, 0, 0))
+                self._scaled = self._display.subsurface(_scale_rect(
+                    config.RENDER_SIZE, self._display.get_size(),
+                    config.SCALE_MODE == 'integer'
+                ))
+            else:
+                self._screen = self._display
+                self._scaled = None
 
         # Display must be initialized before tileset init
         TILESET.init()
 
-        scroll_speed = game_coords_to_ui(abs(scroll_speed))[0]
-        background = BlueSkyBackground()
-        self.level = Level(n_columns, scroll_speed)
-        self.player = Wivs()
+        if config.DIRTY_RECTS and not config.RING_LEVEL:
+            self._render_group = pygame.sprite.LayeredDirty()
+            groups = (self._render_group,)
+        else:
+            self._render_group = None
+            groups = ()
+
+        scroll_speed = game_coords_to_ui(abs(scroll_speed), config=config)[0]
+        background = BlueSkyBackground(*groups, config=config)
+        if config.RING_LEVEL:
+            self.level = RingLevel(n_columns, scroll_speed, gaps, config)
+        else:
+            self.level = Level(n_columns, scroll_speed, gaps, *groups,
+                config=config
+            )
+        self.player = Wivs(*groups, config=config)
 
         # Note order is update/draw order
-        self.sfcs = [background, self.level, self.player, Score()]
+        self.sfcs = [
+            background, self.level, self.player,
+            Score(*groups, config=config),
+            HighScore(*groups, score=high_score, config=config),
+        ]
 
-        self.audioplayer = AudioPlayer()
+        if timer is not None:
+            self.hud = TimingHUD(timer, *groups)
+            self.sfcs.append(self.hud)
+        else:
+            self.hud = None
 
-    def draw(self):
-        """Call once per frame to draw all ui elements"""
-        for sfc in self.sfcs:
-            sfc.draw(self._screen)
+        self._updates = handler_table(
+            (sfc.update, getattr(sfc, 'STATES', ALL)) for sfc in self.sfcs
+        )
+
+        if self._render_group is not None:
+            bg = pygame.Surface(self._screen.get_size()).convert()
+            bg.fill(background.fill_color)
+            self._render_group.clear(self._screen, bg)
+            self._render_group.repaint_rect(self._screen.get_rect())
 
-        pygame.display.flip()
+        self.audioplayer = AudioPlayer(config)
+
+    def draw(self, alpha=None, surface=None):
+        """
+        Call once per frame to draw all ui elements. If alpha is given,
+        moving sprites are drawn that fraction of the way from their
+        previous to their current positions.
+
+        If surface (of the screen's size) is given, everything is drawn to
+        it instead of the screen, and the display is not updated. Nor is it
+        if offscreen.
+        """
+        moved = self._interpolate(alpha) if alpha is not None else ()
+        if isinstance(self.level, RingLevel):
+            # The strip is not a sprite; it interpolates its own scrolling
+            self.level.alpha = alpha
+
+        if surface is not None:
+            for sfc in self.sfcs:
+                sfc.draw(surface)
+        elif self._render_group is not None:
+            rects = self._render_group.draw(self._screen)
+        else:
+            for sfc in self.sfcs:
+                sfc.draw(self._screen)
+
+        for sprite, topleft in moved:
+            sprite.rect.topleft = topleft
+
+        if surface is not None or self.offscreen:
+            return
+        elif self._scaled is not None:
+            if self.config.SCALE_MODE == 'integer':
+                scale = pygame.transform.scale
+            else:
+                scale = pygame.transform.smoothscale
+            scale(self._screen, self._scaled.get_size(), self._scaled)
+            pygame.display.flip()
+        elif self._render_group is not None:
+            pygame.display.update(rects)
+        else:
+            pygame.display.flip()
 
     def postupdate(self, gamestate, gamedata, dt):
         """
@@ -98,28 +260,84 @@ class UIManager:
         if gamestate.state == gamestate.COLLISION:
             self.player.update(gamestate, gamedata, dt)
 
+    @property
+    def reset_delay(self):
+        """
+        Seconds a GameState should wait after a collision before the reset:
+        the length of the collision sound, or MUTED_RESET_DELAY if muted.
+        """
+        if self.config.MUTE:
+            return self.MUTED_RESET_DELAY
+        return self.audioplayer.length('collision')
+
+    @property
+    def screen(self):
+        """
+        The surface draw() draws to, of CONFIG.RENDER_SIZE. This is the
+        display surface unless offscreen or frames are scaled to the
+        display.
+        """
+        return self._screen
+
     def update(self, gamestate, gamedata, dt):
         """Call once per frame to update all ui elements."""
-        for sfc in self.sfcs:
-            sfc.update(gamestate, gamedata, dt)
+        if gamestate.kwargs.pop('toggle_hud', False) and self.hud is not None:
+            self.hud.toggle()
+
+        for update in self._updates[gamestate.state]:
+            update(gamestate, gamedata, dt)
 
         # Detect collision between player and level sprites
-        if (gamestate.state != gamestate.WAIT_RESET and
+        if (self.config.PRECISE_COLLISION and
+            gamestate.state != gamestate.WAIT_RESET and
             pygame.sprite.spritecollide(self.player, self.level.sprites,
                 collided=pygame.sprite.collide_mask, dokill=False
         )):
             gamestate.state = gamestate.COLLISION
 
         # Update audio
-        if not CONFIG.MUTE:
+        if not self.config.MUTE:
             self.audioplayer.update(gamestate)
             
         elif 'mute' in gamestate.kwargs:
             self.audioplayer.stop_all()
             gamestate.kwargs.pop('mute')
-            
-        elif gamestate.state == gamestate.RESET:
-            # Small delay to make up for wait_until_sound_end when unmuted
-            pygame.time.wait(1000)
 
         self.postupdate(gamestate, gamedata, dt)
+
+    def _interpolate(self, alpha):
+        """
+        Move sprites with a prev_topleft to their interpolated positions.
+        Return list of (sprite, current topleft) so they can be restored.
+        """
+        moved = []
+        for sprite in [self.player] + self.level.sprites.sprites():
+            prev = sprite.prev_topleft
+            if prev is None:
+                continue
+
+            x, y = sprite.rect.topleft
+            moved.append((sprite, (x, y)))
+            if not sprite.dirty:
+                sprite.dirty = 1
+            sprite.rect.topleft = (
+                prev[0] + alpha*(x - prev[0]), prev[1] + alpha*(y - prev[1])
+            )
+
+        return moved
+
+def _scale_rect(size, display_size, integer=False):
+    """
+    Return the Rect, centered in display_size, that a surface of size is
+    scaled to: the largest integer multiple of size that fits if integer
+    (and one does), otherwise the largest size of the same aspect ratio.
+    """
+    w, h = size
+    dw, dh = display_size
+    k = min(dw // w, dh // h) if integer else 0
+    if not k:
+        k = min(dw / w, dh / h)
+
+    rect = pygame.Rect(0, 0, round(w*k), round(h*k))
+    rect.center = (dw // 2, dh // 2)
+    return rect
@@ -4,20 +4,24 @@ Author: Adam Beagle
 """
 import pygame
 
+from flippyflapwivs import CONFIG
 from .tileset import TILESET
 from .util import game_coords_to_ui
     
 class Wivs(pygame.sprite.DirtySprite):
     """Player sprite. Call update() and draw() once per frame."""
+    _layer = 2
     images = {
         'default' : 'pc_right',
         'collision' : 'pc_foward',
     }
 
-    def __init__(self, *groups):
+    def __init__(self, *groups, config=None):
         super().__init__(*groups)
-        self.image = self._get_image('default')
+        self.config = CONFIG if config is None else config
+        self._set_image('default')
         self.rect = self.image.get_rect()
+        self.prev_topleft = None
         self.dirty = 2
 
     def draw(self, sfc):
@@ -25,12 +29,18 @@ class Wivs(pygame.sprite.DirtySprite):
 
     def update(self, gamestate, gamedata, dt):
         gs = gamestate
-        self.rect.topleft = game_coords_to_ui(*gamedata.player_position)
+        self.prev_topleft = self.rect.topleft
+        self.rect.topleft = game_coords_to_ui(*gamedata.player_position,
+            config=self.config
+        )
 
         if gs.state == gs.COLLISION:
-            self.image = self._get_image('collision')
+            self._set_image('collision')
         elif gs.state == gs.RESET:
-            self.image = self._get_image('default')
+            self._set_image('default')
+            self.prev_topleft = None
 
-    def _get_image(self, key):
-        return TILESET.TILES[self.images[key]]
+    def _set_image(self, key):
+        """Set image, and its mask for precise collision detection."""
+        self.image = TILESET.TILES[self.images[key]]
+        self.mask = TILESET.MASKS[self.images[key]]
@@ -3,8 +3,8 @@ resmaps.py
 Author: Adam Beagle
 
 PURPORSE:
-  Ui modules should use the IMAGES and SOUNDS dicts from this module to
-  retrieve paths to resource files. Resource file paths can then be changed
+  Ui modules should use the CACHES, IMAGES and SOUNDS dicts from this module
+  to retrieve paths to resource files. Resource file paths can then be changed
   only in this file without breaking anything.
 """
 from os.path import abspath, dirname, join, pardir
@@ -14,7 +14,13 @@ _resource_root = abspath(join(dirname(__file__), pardir, 'res', ))
 _image_path = join(_resource_root, 'images')
 _sound_path = join(_resource_root, 'sounds')
 
-# Public constants
+# Public constants. 'columns' is formatted with the width and height of
+# the column images it holds.
+CACHES = {
+    'assets' : join(_resource_root, 'assets.cache'),
+    'columns' : join(_resource_root, 'columns-{}x{}.cache'),
+}
+
 IMAGES = {
     'tileset' : join(_image_path, 'tileset.png'),
 }
@@ -1,9 +1,11 @@
-from random import choice, uniform
+from collections import OrderedDict
+from random import uniform
 
 from adamlib.util.misc import iterdigits
 import pygame
 
 from flippyflapwivs import CONFIG
+from game.states import RESET, SCORE, mask
 from .tileset import TILESET
 from .util import game_coords_to_ui
 
@@ -26,20 +28,25 @@ class TilesetSprite(pygame.sprite.DirtySprite):
 # SPRITES
 class Cloud(TilesetSprite):
     """Cloud sprite. Automatically travels left at random speed."""
-    def __init__(self, *groups):
+    _layer = 0
+
+    def __init__(self, *groups, config=None):
         super().__init__('cloud', *groups)
+        self.config = CONFIG if config is None else config
         self.dirty = 2
         self.reset()
 
         # Randomize start position for stagger effect
-        sw = CONFIG.SCREEN_SIZE[0]
+        sw = self.config.RENDER_SIZE[0]
         self.rect.left = int(sw*uniform(.1, 1))
 
     def reset(self):
-        sw, sh = CONFIG.SCREEN_SIZE
+        sw, sh = self.config.RENDER_SIZE
         self.rect.left = sw
         self.rect.top = int(sw*uniform(.02, .2))
-        self.dx = -1*game_coords_to_ui(uniform(.0002, .002))[0]
+        self.dx = -1*game_coords_to_ui(uniform(.0002, .002),
+            config=self.config
+        )[0]
 
     def update(self, gamestate, gamedata, dt):
         if self.rect.right <= 0:
@@ -48,61 +55,130 @@ class Cloud(TilesetSprite):
         self.rect.right += dt*self.dx
 
 class Column(pygame.sprite.DirtySprite):
-    column_img = None 
-    column_open_img = None 
-    column_close_img = None 
-    
-    def __init__(self, *groups):
-        super().__init__(*groups)
+    """
+    Column sprite. The image and mask are shared, pre-rendered variants
+    from a ColumnPool, and are swapped via set_variant() so that sprites
+    can be reused rather than reallocated when a column respawns.
+    """
+    _layer = 1
 
-        # Instantiate images
-        self.column_img = TILESET.TILES['column']
-        self.column_open_img = TILESET.TILES['column_open']
-        self.column_close_img = pygame.transform.flip(
-            TILESET.TILES['column_open'], 0, 1
-        )
-        
+    def __init__(self, *groups, config=None):
+        super().__init__(*groups)
         side = TILESET.SIDE
-        self.w, self.h = side, CONFIG.SCREEN_SIZE[1] - side
-        self.image = pygame.Surface((self.w, self.h), pygame.SRCALPHA)
-        self.rect = self.image.get_rect()
-        self.rect.left = CONFIG.SCREEN_SIZE[0]
-        self.mask = None # Set in _initial_draw
+        w, h = (CONFIG if config is None else config).RENDER_SIZE
+        self.image = None # Set in set_variant
+        self.mask = None # Set in set_variant
+        self.rect = pygame.Rect(w, 0, side, h - side)
+        self.prev_topleft = None
         self.dirty = 0
-        self._initial_draw()
 
-    def _initial_draw(self):
+    def set_variant(self, variant):
+        """variant is an (image, mask) tuple from ColumnPool.get()."""
+        self.image, self.mask = variant
+        self.dirty = 1
+
+    # Columns are updated in level.Level
+    def update(self, *args, **kwargs):
+        pass
+
+class ColumnPool:
+    """
+    Cache of rendered column images and their collision masks, keyed by
+    gap, the game y of the top of the column opening (see
+    game.gamedata.Column).
+
+    If maxsize is None, a variant for each of gaps is rendered on
+    creation. Otherwise, variants are rendered on first use and at most
+    maxsize are kept, least recently used first out. Rendered variants are
+    also kept in the TILESET.column_cache() of their size, so they are only
+    rendered on a cold cache.
+
+    ATTRIBUTES:
+      CAP_H - Height in px of the solid part of the column_open tile
+
+    METHODS:
+      get
+    """
+    CAP_H = 5
+
+    def __init__(self, gaps, maxsize=None, config=None):
+        side = TILESET.SIDE
+        self.config = CONFIG if config is None else config
+        self.maxsize = maxsize
+        self.w, self.h = side, self.config.RENDER_SIZE[1] - side
+
+        self._column_img = TILESET.TILES['column']
+        self._column_open_img = TILESET.TILES['column_open']
+        self._column_close_img = TILESET.TILES['column_close']
+        self._variants = OrderedDict()
+        self._cache = TILESET.column_cache((self.w, self.h))
+
+        if maxsize is None:
+            for gap in gaps:
+                self._variants[gap] = self._load(gap)
+
+            self._cache.save()
+
+    def get(self, gap):
+        """Return (image, mask) tuple for gap."""
+        try:
+            variant = self._variants[gap]
+        except KeyError:
+            variant = self._variants[gap] = self._load(gap)
+            if self.maxsize is not None and len(self._variants) > self.maxsize:
+                self._variants.popitem(last=False)
+        else:
+            if self.maxsize is not None:
+                self._variants.move_to_end(gap)
+
+        return variant
+
+    def _load(self, gap):
+        """Return variant for gap from the cache, rendering on a miss."""
+        name = repr(gap)
+        image = self._cache.get_surface(name)
+        mask = self._cache.get_mask(name)
+
+        if image is None or mask is None:
+            image, mask = self._render(gap)
+            self._cache.put_surface(name, image)
+            self._cache.put_mask(name, mask)
+
+        return image, mask
+
+    def _render(self, gap):
         side = TILESET.SIDE
-        open_top = int(uniform(.2*self.h, .7*self.h))
-        self.image.blit(self.column_open_img, (0, open_top))
+        open_top = int(game_coords_to_ui(y=gap, config=self.config)[1]) \
+            - self.CAP_H
+        image = pygame.Surface((self.w, self.h), pygame.SRCALPHA)
+        image.blit(self._column_open_img, (0, open_top))
 
         # Blit column above open
         for y in range(open_top - side, (-side) + 1, -side):
-            self.image.blit(self.column_img, (0, y))
+            image.blit(self._column_img, (0, y))
 
         # Blit column below open
-        self.image.blit(self.column_close_img, (0, open_top + 2*side))
+        image.blit(self._column_close_img, (0, open_top + 2*side))
         for y in range(open_top + 3*side, self.h, side):
-            self.image.blit(self.column_img, (0, y))
+            image.blit(self._column_img, (0, y))
 
-        self.mask = pygame.mask.from_surface(self.image)
-
-    # Columns are updated in level.Level
-    def update(self, *args, **kwargs):
-        pass
+        return image, pygame.mask.from_surface(image)
 
 class Ground(pygame.sprite.DirtySprite):
+    _layer = 1
     single_img = None 
 
-    def __init__(self, scroll_speed, *groups):
+    def __init__(self, scroll_speed, *groups, config=None):
         super().__init__(*groups)
         if self.single_img is None:
             self.single_img = TILESET.TILES['ground']
+        sw, sh = (CONFIG if config is None else config).RENDER_SIZE
         self.speed = scroll_speed
-        self.w, self.h = CONFIG.SCREEN_SIZE[0] + TILESET.SIDE, TILESET.SIDE
+        self.w, self.h = sw + TILESET.SIDE, TILESET.SIDE
         self.image = pygame.Surface((self.w, self.h))
         self.rect = self.image.get_rect()
-        self.rect.bottom = CONFIG.SCREEN_SIZE[1]
+        self.rect.bottom = sh
+        self.prev_topleft = None
         self.mask = pygame.mask.Mask((self.w, self.h))
         self.mask.fill()
         self._initial_draw()
@@ -114,34 +190,104 @@ class Ground(pygame.sprite.DirtySprite):
             self.rect.left -= dt*self.speed
         else:
             self.rect.left = 0
+            self.prev_topleft = None # Don't interpolate across the wrap
+
+        self.dirty = 1
 
     def _initial_draw(self):
         for x in range(0, self.rect.w + 1, TILESET.SIDE):
             self.image.blit(self.single_img, (x, 0))
 
+class NumberCache:
+    """
+    LRU cache of rendered numbers. Each surface is just wide enough for its
+    digits. Returned surfaces are shared and must not be drawn on.
+
+    For use in this module only. Other modules must use the NUMBERS
+    instance of this class.
+
+    METHODS:
+      get
+    """
+    DIGIT_OVERLAP = 20 # Custom offset for this tileset
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._numbers = OrderedDict()
+
+    def get(self, n):
+        """Return surface of n rendered from the tileset's digit tiles."""
+        try:
+            image = self._numbers[n]
+        except KeyError:
+            image = self._numbers[n] = self._render(n)
+            if len(self._numbers) > self.maxsize:
+                self._numbers.popitem(last=False)
+        else:
+            self._numbers.move_to_end(n)
+
+        return image
+
+    def _render(self, n):
+        side = TILESET.SIDE
+        step = side - self.DIGIT_OVERLAP
+        digits = list(iterdigits(n))
+        w = side + (len(digits) - 1)*step
+
+        image = pygame.Surface((w, side), flags=pygame.SRCALPHA)
+        for i, d in enumerate(digits):
+            image.blit(TILESET.TILES[str(d)], (w - side - i*step, 0))
+
+        return image
+
+NUMBERS = NumberCache()
+
 class Score(pygame.sprite.DirtySprite):
-    def __init__(self, *groups, score=0, high_score=0):
+    """
+    Displays the current score at the top right of the screen. Redraws
+    only when the score changes, so is only updated in SCORE and RESET.
+    """
+    STATES = mask(SCORE, RESET)
+    _layer = 3
+
+    def __init__(self, *groups, score=0, config=None):
         super().__init__(*groups)
-        side = TILESET.SIDE
-        self.image = pygame.Surface((3*side, side), flags=pygame.SRCALPHA)
-        self.rect = self.image.get_rect()
-        self.rect.top = game_coords_to_ui(y=.02)[1]
-        self.rect.right = CONFIG.SCREEN_SIZE[0]
-        self._redraw(score)
+        self.config = CONFIG if config is None else config
+        self.value = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self._set(score)
 
     def draw(self, sfc):
         sfc.blit(self.image, self.rect.topleft)
 
     def update(self, gamestate, gamedata, dt):
-        if gamestate.state in (gamestate.SCORE, gamestate.RESET):
-            self._redraw(gamedata.score)
-
-    def _redraw(self, score):
-        self.image.fill((0, 0, 0, 0))
-        for i, d in enumerate(iterdigits(score)):
-            x = self.rect.width - (i + 1)*TILESET.SIDE
-
-            # Custom offset for this tileset
-            x += 20*i
-                
-            self.image.blit(TILESET.TILES[str(d)], (x, 0))
+        self._set(self._get_value(gamedata))
+
+    def _get_value(self, gamedata):
+        return gamedata.score
+
+    def _place(self):
+        self.rect.top = game_coords_to_ui(y=.02, config=self.config)[1]
+        self.rect.right = self.config.RENDER_SIZE[0]
+
+    def _set(self, value):
+        if value == self.value:
+            return
+
+        self.value = value
+        self.image = NUMBERS.get(value)
+        self.rect = self.image.get_rect()
+        self._place()
+        self.dirty = 1
+
+class HighScore(Score):
+    """
+    Displays the high score at the top left of the screen. The game only
+    raises its high score on the frame after a score, so a new record is
+    taken from the score itself.
+    """
+    def _get_value(self, gamedata):
+        return max(gamedata.high_score, gamedata.score)
+
+    def _place(self):
+        self.rect.topleft = game_coords_to_ui(.02, .02, config=self.config)
@@ -10,13 +10,23 @@ USAGE:
     pygame.display.set_mode() have been called for TILESET.TILES to be
     correctly instantiated.
 
+    Converted tiles, derived tiles (e.g. 'column_close') and tile masks are
+    kept in an on-disk AssetCache keyed by the tileset file's hash, so later
+    launches load them without decoding or converting the tileset image.
+    Assets derived from the tileset at a given size, such as column images,
+    go in the cache of their size from TILESET.column_cache(), so a launch
+    only reads the assets of its own resolution.
+
     Use the instructions for _tileset_map below to map descriptive names
     to particular tiles.
 """
+from hashlib import sha1
+
 from adamlib.game.pygame.tileset import tileset_to_dict
 import pygame
 
-from .resmaps import IMAGES
+from .assetcache import AssetCache
+from .resmaps import CACHES, IMAGES
 
 class Tileset:
     """
@@ -26,21 +36,68 @@ class Tileset:
 
     init() must be called AFTER pygame.init() and pygame.display.set_mode()
     have been called for TILESET.TILES to be correctly instantiated.
+
+    ATTRIBUTES:
+      MASKS - Collision mask of each of TILES, by the same keys
+      SIDE
+      TILES
+      cache - AssetCache of the tiles
+
+    METHODS:
+      column_cache
+      init
     """
     SIDE = 64
+    MASKS = None
     TILES = None
-    tileset_img = None
+    cache = None
+    tileset_img = None # Only loaded if cache is cold
+    _key = None # Hash of the tileset file
+
+    def column_cache(self, size):
+        """
+        Return an AssetCache for column images of size (w, h). Must be
+        called after init().
+        """
+        return AssetCache(CACHES['columns'].format(*size), self._key)
 
     def init(self):
         """
-        Init _tileset_img and TILES. No return value. This function must be
+        Init TILES, MASKS and cache. No return value. This function must be
         called after pygame.init() and pygame.display.set_mode() have been
         called or pygame.error will be raised.
         """
-        self.tileset_img = pygame.image.load(IMAGES['tileset']).convert_alpha()
-        self.TILES = tileset_to_dict(
-            self.tileset_img, self.SIDE, _tileset_map
-        )
+        with open(IMAGES['tileset'], 'rb') as f:
+            self._key = sha1(f.read()).digest()
+        self.cache = AssetCache(CACHES['assets'], self._key)
+
+        keys = list(_tileset_map) + ['column_close']
+        self.TILES = {k : self.cache.get_surface(k) for k in keys}
+
+        if None in self.TILES.values():
+            self.tileset_img = pygame.image.load(
+                IMAGES['tileset']
+            ).convert_alpha()
+            self.TILES = tileset_to_dict(
+                self.tileset_img, self.SIDE, _tileset_map
+            )
+            self.TILES['column_close'] = pygame.transform.flip(
+                self.TILES['column_open'], 0, 1
+            )
+
+            for k, tile in self.TILES.items():
+                self.cache.put_surface(k, tile)
+
+        self.MASKS = {}
+        for k, tile in self.TILES.items():
+            mask = self.cache.get_mask(k)
+            if mask is None:
+                mask = pygame.mask.from_surface(tile)
+                self.cache.put_mask(k, mask)
+
+            self.MASKS[k] = mask
+
+        self.cache.save()
 
 # Values of map are (x, y) coordinates to TILESET_IMG.
 # Sprite pieces are square with side length SIDE, so (0, 0) corresponds to
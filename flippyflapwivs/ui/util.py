@@ -10,6 +10,7 @@ import pygame
 from adamlib.exceptions import BaseErrvalException
 
 from flippyflapwivs import CONFIG
+from .tileset import TILESET
 
 # BASE CLASSES
 class BaseSurface(pygame.Surface):
@@ -31,11 +32,25 @@ class BaseFlapException(BaseErrvalException):
     pass
 
 # FUNCTIONS
-def game_coords_to_ui(x=0, y=0):
+def game_coords_to_ui(x=0, y=0, config=None):
     """
-    Translate game package coordinates (range [0, 1]) to screen coordinates.
+    Translate game package coordinates (range [0, 1]) to render coordinates
+    (see Config.RENDER_SIZE of config, default CONFIG).
     Either or both x and/or y may be passed, but a tuple (x, y) is always
     returned (unpassed coordinate will default to 0).
     """
-    w, h = CONFIG.SCREEN_SIZE
+    if config is None:
+        config = CONFIG
+    w, h = config.RENDER_SIZE
     return (w*x, h*y)
+
+def game_tile_size(config=None):
+    """
+    Return the (w, h) of a tile in game coordinates at the render size of
+    config (default CONFIG): the tile argument of game.GameData, which
+    scales the game's collision geometry to what is drawn.
+    """
+    if config is None:
+        config = CONFIG
+    w, h = config.RENDER_SIZE
+    return (TILESET.SIDE / w, TILESET.SIDE / h)